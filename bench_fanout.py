@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for encode-once room broadcasts (fanout.py)
+
+Compares socketio's emit(), which encodes a packet for every recipient,
+with FrameCache, which encodes each event once per room state and hands
+the same packet to every socket. Measures emits per second (one emit
+reaches every socket in the room) for rooms of 2, 10 and 100 recipients:
+
+  update   one pong_update JSON frame per tick
+  score    a scoring, match-ending tick: pong_update, pong_score and
+           pong_game_over, the last two sharing the room's state dict
+
+Engine.IO sends are a no-op, so only encoding and dispatch are timed.
+
+    python bench_fanout.py
+    python bench_fanout.py --recipients 2 10 100 500 --seconds 2
+"""
+import argparse
+import json
+import sys
+import time
+
+import socketio
+
+from pong_state import new_room_state
+
+ROOM = 'bench-room'
+
+
+def make_server(recipients):
+    """Socket.IO server with `recipients` fake sockets in ROOM and sends discarded"""
+    server = socketio.Server(async_mode='threading')
+    server.eio.send = lambda eio_sid, data: None
+    for i in range(recipients):
+        sid = server.manager.connect(f'eio-{i}', '/')
+        server.manager.enter_room(sid, '/', ROOM)
+    return server
+
+
+def _payloads(room, tick):
+    """pong_update payload like SnapshotEncoder's keyframe, for the room at this tick"""
+    ball = room.game_state.ball
+    ball.x = 100 + tick % 600
+    return {'t': tick, 'st': 1700000000000 + tick * 16,
+            'k': {'bx': ball.x, 'by': ball.y, 'vx': ball.dx, 'vy': ball.dy,
+                  'lp': room.game_state.left.y, 'rp': room.game_state.right.y,
+                  'ls': room.game_state.score.left, 'rs': room.game_state.score.right}}
+
+
+def emit_before(server, room, tick, scenario):
+    """Every event through socketio's emit: one encode per recipient per event"""
+    server.emit('pong_update', _payloads(room, tick), room=ROOM)
+    if scenario == 'score':
+        server.emit('pong_score', {'game_state': room.game_state.to_wire(), 'scoring_side': 'left'}, room=ROOM)
+        server.emit('pong_game_over', {
+            'winner': 'left',
+            'game_state': room.game_state.to_wire(),
+            'score': room.game_state.score.to_wire(),
+            'win_points': room.win_points
+        }, room=ROOM)
+
+
+def emit_after(server, room, tick, scenario):
+    """Every event through the room's FrameCache: one encode per event per state"""
+    frames = room.frames
+    frames.invalidate()  # the state changed this tick
+    frames.emit(server, 'pong_update', ROOM, lambda: _payloads(room, tick))
+    if scenario == 'score':
+        frames.emit(server, 'pong_score', ROOM, lambda: {
+            'game_state': frames.state_wire(room.game_state), 'scoring_side': 'left'})
+        frames.emit(server, 'pong_game_over', ROOM, lambda: {
+            'winner': 'left',
+            'game_state': frames.state_wire(room.game_state),
+            'score': frames.state_wire(room.game_state)['score'],
+            'win_points': room.win_points
+        })
+
+
+def measure(emit, server, scenario, seconds):
+    """Emits per second of emit() over roughly `seconds`"""
+    room = new_room_state('pvp', win_points=5, seed=1)
+    events = 3 if scenario == 'score' else 1
+    ticks = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            emit(server, room, ticks, scenario)
+            ticks += 1
+    elapsed = time.perf_counter() - started
+    return ticks * events / elapsed
+
+
+def run_benchmark(recipients, seconds):
+    results = []
+    for count in recipients:
+        server = make_server(count)
+        for scenario in ('update', 'score'):
+            before = measure(emit_before, server, scenario, seconds)
+            after = measure(emit_after, server, scenario, seconds)
+            results.append({
+                'recipients': count,
+                'scenario': scenario,
+                'before_emits_per_sec': round(before),
+                'after_emits_per_sec': round(after),
+                'speedup': round(after / before, 2)
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipients', type=int, nargs='+', default=[2, 10, 100],
+                        help='sockets in the room')
+    parser.add_argument('--seconds', type=float, default=1.0, help='duration of each measurement')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.recipients, args.seconds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'recipients':>10}  {'scenario':<8}  {'emit() /s':>11}  {'FrameCache /s':>13}  {'speedup':>7}")
+    for r in results:
+        print(f"{r['recipients']:>10}  {r['scenario']:<8}  {r['before_emits_per_sec']:>11,}  "
+              f"{r['after_emits_per_sec']:>13,}  {r['speedup']:>6.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark for the Pong simulation tick path
+
+Creates N synthetic bot-vs-bot rooms in active_rooms and drives the real
+scheduler tick (input, physics, computer paddles, scoring, broadcasts) as
+fast as it will go for T seconds. Socket.IO emission is replaced by a
+counter (room broadcasts are counted as encoded by fanout.FrameCache), so no
+browser or network is needed.
+
+    python bench_game_loop.py --rooms 1000 --seconds 10
+    PONG_BATCH_PHYSICS=1 python bench_game_loop.py --rooms 5000
+    python bench_game_loop.py --logging compare    # logging off vs every subsystem at DEBUG
+"""
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')  # keep the benchmark off the real database
+
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+import fanout
+import run
+import pong_logging
+from pong_state import new_room_state
+from pong_wire import WIRE_BINARY, WIRE_JSON
+
+# Socket.IO framing around an event payload (packet type + binary placeholder)
+_JSON_PACKET_OVERHEAD = len('42')
+_BINARY_PACKET_OVERHEAD = len('451-["pong_update",{"_placeholder":true,"num":0}]')
+
+
+class EmitCounter:
+    """Stands in for socketio.emit and fanout.emit_encoded, counting events and encoded bytes"""
+
+    def __init__(self):
+        self.events = {}
+        self.bytes = {}
+
+    def __call__(self, event, data=None, **kwargs):
+        if isinstance(data, (bytes, bytearray)):
+            size = len(data) + _BINARY_PACKET_OVERHEAD
+        else:
+            size = len(json.dumps([event, data], separators=(',', ':'))) + _JSON_PACKET_OVERHEAD
+        self._count(event, size)
+
+    def encoded(self, server, encoded_event, room, namespace='/'):
+        packets = encoded_event.encoded
+        size = sum(map(len, packets)) if isinstance(packets, list) else len(packets)
+        self._count(encoded_event.data[0], size)
+        return 1
+
+    def _count(self, event, size):
+        self.events[event] = self.events.get(event, 0) + 1
+        self.bytes[event] = self.bytes.get(event, 0) + size
+
+    @property
+    def total_bytes(self):
+        return sum(self.bytes.values())
+
+
+class CountingHandler(logging.StreamHandler):
+    """Formats log records like the server would, into /dev/null, and counts them"""
+
+    def __init__(self):
+        super().__init__(open(os.devnull, 'w'))
+        self.records = 0
+
+    def emit(self, record):
+        self.records += 1
+        super().emit(record)
+
+
+def set_logging(mode):
+    """Route server logs to a counting handler; 'off' silences them, 'on' enables DEBUG everywhere"""
+    handler = pong_logging.configure_logging(handler=CountingHandler())
+    if mode == 'off':
+        pong_logging.set_level(logging.CRITICAL + 1)
+    elif mode == 'on':
+        pong_logging.set_level(logging.DEBUG)
+    return handler
+
+
+def create_rooms(count, wire, broadcast_hz):
+    """Bot-vs-bot rooms registered with the scheduler; returns bytes allocated per room"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        room_id = f"bench-{i}"
+        room = new_room_state('bot', win_points=10 ** 6, room_creator='bench', broadcast_hz=broadcast_hz)
+        room.players['left'] = 'Computer'
+        room.players['right'] = 'Computer'
+        room.set_wire(f"sid-{i}", wire)  # one subscriber so frames are encoded
+        room.game_running = True
+        run.active_rooms[room_id] = room
+        run.scheduler.add(room_id, start=False)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count if count else 0
+
+
+def remove_rooms():
+    for room_id in run.active_rooms.keys():
+        run.scheduler.remove(room_id)
+        run.active_rooms.remove(room_id)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(rooms, seconds, wire, broadcast_hz, log_mode='env'):
+    counter = EmitCounter()
+    run.socketio.emit = counter
+    fanout.emit_encoded = counter.encoded
+    log_handler = set_logging(log_mode)
+    remove_rooms()
+    bytes_per_room = create_rooms(rooms, wire, broadcast_hz)
+
+    tick = run.scheduler.tick
+    durations = []
+    # Short warm-up so back-to-back runs (--logging compare) start from the same footing
+    warm_until = time.perf_counter() + min(1.0, seconds / 5)
+    while time.perf_counter() < warm_until:
+        tick()
+    counter.events.clear()
+    counter.bytes.clear()
+    log_handler.records = 0
+
+    started = time.perf_counter()
+    deadline = started + seconds
+    now = started
+    while now < deadline:
+        tick()
+        after = time.perf_counter()
+        durations.append(after - now)
+        now = after
+    elapsed = now - started
+
+    durations.sort()
+    ticks = len(durations)
+    budget_ms = 1000.0 / run.TICK_RATE
+    simulated_seconds = ticks / run.TICK_RATE
+    return {
+        'rooms': rooms,
+        'wire': wire,
+        'broadcast_hz': broadcast_hz,
+        'batch_physics': run.batch_engine is not None,
+        'logging': log_mode,
+        'log_records': log_handler.records,
+        'seconds': round(elapsed, 3),
+        'ticks': ticks,
+        'ticks_per_sec': round(ticks / elapsed, 1),
+        'tick_ms_p50': round(percentile(durations, 50) * 1000, 3),
+        'tick_ms_p99': round(percentile(durations, 99) * 1000, 3),
+        'tick_ms_max': round(durations[-1] * 1000, 3) if durations else 0.0,
+        'tick_budget_ms': round(budget_ms, 3),
+        'realtime_factor': round(simulated_seconds / elapsed, 2),
+        'emitted_events': counter.events,
+        'emitted_bytes_per_sim_sec': round(counter.total_bytes / simulated_seconds) if ticks else 0,
+        'emitted_bytes_per_room_sec': round(counter.total_bytes / simulated_seconds / rooms) if ticks and rooms else 0,
+        'memory_bytes_per_room': round(bytes_per_room),
+    }
+
+
+def print_report(result):
+    print(f"Rooms:                {result['rooms']} ({result['wire']} wire, {result['broadcast_hz']} Hz broadcast, "
+          f"{'batch' if result['batch_physics'] else 'per-room'} physics)")
+    print(f"Ticks:                {result['ticks']} in {result['seconds']} s "
+          f"({result['ticks_per_sec']} ticks/s, {result['realtime_factor']}x real time)")
+    print(f"Tick duration (ms):   p50 {result['tick_ms_p50']}  p99 {result['tick_ms_p99']}  "
+          f"max {result['tick_ms_max']}  (budget {result['tick_budget_ms']})")
+    print(f"Emitted bytes/s:      {result['emitted_bytes_per_sim_sec']} total, "
+          f"{result['emitted_bytes_per_room_sec']} per room (per simulated second)")
+    print(f"Emitted events:       {result['emitted_events']}")
+    print(f"Memory per room:      {result['memory_bytes_per_room']} bytes")
+    print(f"Logging:              {result['logging']} ({result['log_records']} records)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=500, help='synthetic rooms to simulate')
+    parser.add_argument('--seconds', type=float, default=10.0, help='wall-clock duration')
+    parser.add_argument('--wire', choices=(WIRE_JSON, WIRE_BINARY), default=WIRE_JSON,
+                        help='state frame encoding to count')
+    parser.add_argument('--broadcast-hz', type=int, default=run.BROADCAST_RATE, choices=run.BROADCAST_RATES)
+    parser.add_argument('--logging', choices=('env', 'off', 'on', 'compare'), default='env',
+                        help='log levels from PONG_LOG_* (env), all off, all DEBUG (on), or off then on (compare)')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args(argv)
+
+    modes = ('off', 'on') if args.logging == 'compare' else (args.logging,)
+    results = [run_benchmark(args.rooms, args.seconds, args.wire, args.broadcast_hz, mode) for mode in modes]
+    if args.json:
+        print(json.dumps(results if len(results) > 1 else results[0], indent=2))
+        return 0
+    for result in results:
+        print_report(result)
+        print()
+    if len(results) > 1:
+        off, on = results
+        print(f"Logging on vs off:    {on['ticks_per_sec']} vs {off['ticks_per_sec']} ticks/s "
+              f"({(on['ticks_per_sec'] / off['ticks_per_sec'] - 1) * 100:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
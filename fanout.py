@@ -0,0 +1,88 @@
+"""
+Serialize-once fan-out to Socket.IO rooms
+
+socketio.emit(event, data, room=...) builds and encodes a new packet for
+every recipient, so a frame sent to N sockets is JSON-encoded N times.
+EncodedEvent encodes the packet once, and emit_encoded() hands that same
+packet to the server's _send_packet for every socket in the room. With
+instrument_socketio (metrics.py) or the Socket.IO test client in place,
+each recipient is still counted or delivered as usual.
+
+    frame = EncodedEvent(socketio.server, 'pong_update', payload)
+    emit_encoded(socketio.server, frame, 'room-id/spectate/json')
+
+Each room also keeps a FrameCache of the events encoded for its current
+state. The room's state dict is built once and shared by every event that
+carries it (pong_score, pong_game_over, ...). An event sent to several
+channels in one tick is encoded only the first time. The owner calls
+invalidate() whenever the state changes.
+
+    room.frames.emit(socketio.server, 'pong_score', room_id,
+                     lambda: {'game_state': room.frames.state_wire(room.game_state), ...})
+"""
+from socketio import packet
+
+
+class EncodedEvent:
+    """A Socket.IO event packet encoded once; encode() returns the cached result"""
+    __slots__ = ('packet_type', 'namespace', 'data', 'encoded')
+
+    def __init__(self, server, event, data, namespace='/', binary=None):
+        # binary=None scans data for bytes; pass True/False when the caller knows
+        pkt = server.packet_class(packet.EVENT, namespace=namespace, data=[event, data], binary=binary)
+        self.packet_type = pkt.packet_type  # BINARY_EVENT when data holds bytes
+        self.namespace = namespace
+        self.data = pkt.data
+        self.encoded = pkt.encode()  # str, or [str, attachments...] for binary events
+
+    def encode(self):
+        return self.encoded
+
+
+def emit_encoded(server, event, room, namespace='/'):
+    """Send an EncodedEvent to every socket in room; returns the number of recipients"""
+    recipients = 0
+    if namespace not in server.manager.rooms:
+        return recipients  # nobody has connected yet
+    for _, eio_sid in server.manager.get_participants(namespace, room):
+        server._send_packet(eio_sid, event)
+        recipients += 1
+    return recipients
+
+
+class FrameCache:
+    """Events encoded for one room's current state, until invalidate()"""
+    __slots__ = ('events', 'state')
+
+    def __init__(self):
+        self.events = {}  # key -> EncodedEvent
+        self.state = None  # game_state.to_wire() of the current state
+
+    def invalidate(self):
+        """Forget everything encoded so far; call after any change to the room's state"""
+        if self.events:
+            self.events.clear()
+        self.state = None
+
+    def state_wire(self, game_state):
+        """game_state.to_wire(), built once per state and shared by every event"""
+        if self.state is None:
+            self.state = game_state.to_wire()
+        return self.state
+
+    def event(self, server, event, build, key=None):
+        """EncodedEvent for key (default: the event name), from build() on first use
+
+        build() returns either bytes (a binary frame) or JSON-only data.
+        """
+        key = event if key is None else key
+        encoded = self.events.get(key)
+        if encoded is None:
+            data = build()
+            encoded = self.events[key] = EncodedEvent(server, event, data,
+                                                      binary=isinstance(data, (bytes, bytearray)))
+        return encoded
+
+    def emit(self, server, event, room, build, key=None):
+        """Send the cached event to every socket in room; returns the number of recipients"""
+        return emit_encoded(server, self.event(server, event, build, key), room)
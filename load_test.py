@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Socket.IO load generator for Pong multiplayer
+
+Registers and logs in many users over HTTP, then drives one Socket.IO client
+per user against a running server: creators make PvP or vs Computer rooms on
+the dashboard, guests join the PvP rooms, games are started and every client
+streams paddle moves while measuring what comes back.
+
+Per client it records join latency (join_room -> pong_init), start latency
+(pong_start_game -> first pong_update), pong_update inter-arrival jitter,
+frame age (server 'st' stamp vs local clock, on binary frames and JSON
+keyframes, meaningful when the server runs on this machine) and dropped (tick gaps) or late (interval over --late-factor
+x the room's broadcast period) frames.
+
+    python start.py                      # in another terminal
+    python load_test.py --clients 100 --duration 30
+    python load_test.py --clients 50,100,200,400 --bot-ratio 0.5
+
+Several --clients levels run one after another so the summary shows where
+the server starts falling behind. Needs the Socket.IO client extras:
+pip install requests websocket-client
+"""
+import argparse
+import json
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+
+import engineio
+import requests
+import socketio
+
+from pong_wire import FRAME, PADDLE_MOVE, WIRE_BINARY, WIRE_JSON, WIRE_VERSION
+
+PASSWORD = "load-test-password"
+CANVAS_HEIGHT = 600
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _OrderedEngineIOClient(engineio.Client):
+    """Handle messages in arrival order on the reader thread
+
+    The stock client dispatches each message on its own thread, which can
+    separate a binary pong_update from its attachment and skews arrival times.
+    """
+
+    def _trigger_event(self, event, *args, **kwargs):
+        if event == 'message':
+            kwargs['run_async'] = False
+        return super()._trigger_event(event, *args, **kwargs)
+
+
+class OrderedClient(socketio.Client):
+    def _engineio_client_class(self):
+        return _OrderedEngineIOClient
+
+
+class ClientStats:
+    """Measurements collected by one simulated player"""
+
+    def __init__(self):
+        self.join_ms = None
+        self.start_ms = []  # pong_start_game -> first pong_update, per game
+        self.intervals_ms = []  # pong_update inter-arrival
+        self.frame_age_ms = []
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+        self.moves = 0
+        self.games = 0
+        self.errors = []
+
+
+class LoadClient:
+    """One user: HTTP login, then a Socket.IO session in a room"""
+
+    def __init__(self, base_url, username, mode, args, room_ready=None, creator=True):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.mode = mode
+        self.args = args
+        self.creator = creator
+        self.room_ready = room_ready or {'event': threading.Event(), 'room_id': None}
+        self.stats = ClientStats()
+        self.http = requests.Session()
+        self.sio = OrderedClient(reconnection=False, http_session=self.http)
+        self.room_id = None
+        self.side = None
+        self.phase = random.Random(username).random() * 2 * math.pi
+        self.frame_period = None
+        self.tick_step = None
+        self.last_arrival = None
+        self.last_tick = None
+        self.start_sent = None
+        self.join_sent = None
+        self.joined = threading.Event()
+        self.opponent_ready = threading.Event()
+        self.running = threading.Event()
+        self.game_over = threading.Event()
+        self.lock = threading.Lock()
+        self._register_handlers()
+
+    # HTTP
+    def login(self):
+        """Register (or log in if the user already exists) and keep the session cookie"""
+        form = {'username': self.username, 'password': PASSWORD}
+        resp = self.http.post(f"{self.base_url}/register", data=form, timeout=10)
+        if not resp.url.endswith('/dashboard'):
+            resp = self.http.post(f"{self.base_url}/login", data=form, timeout=10)
+        if not resp.url.endswith('/dashboard'):
+            raise RuntimeError(f"login failed for {self.username}")
+
+    def create_room(self):
+        """Create a public room on the dashboard; the redirect carries its id"""
+        form = {
+            'room_name': f"load {self.username}",
+            'room_type': 'public',
+            'room_mode': self.mode,
+            'win_points': str(self.args.win_points),
+            'broadcast_hz': str(self.args.broadcast_hz),
+        }
+        resp = self.http.post(f"{self.base_url}/dashboard", data=form, timeout=10)
+        if '/game/' not in resp.url:
+            raise RuntimeError(f"room creation failed for {self.username}")
+        return resp.url.rsplit('/game/', 1)[1].split('?')[0]
+
+    # Socket.IO
+    def _register_handlers(self):
+        sio = self.sio
+
+        @sio.on('pong_init')
+        def on_init(data):
+            if self.join_sent is not None and self.stats.join_ms is None:
+                self.stats.join_ms = (time.perf_counter() - self.join_sent) * 1000
+            self.side = data.get('you')
+            hz = data.get('broadcast_hz') or 20
+            tick_rate = data.get('tick_rate') or 60
+            self.frame_period = 1.0 / hz
+            self.tick_step = max(1, tick_rate // hz)
+            self._check_players(data.get('players'))
+            self.joined.set()
+
+        @sio.on('players_update')
+        def on_players(data):
+            self._check_players(data.get('players'))
+
+        @sio.on('pong_game_started')
+        def on_started(data):
+            with self.lock:
+                self.last_arrival = None
+                self.last_tick = None
+                if self.start_sent is None:
+                    self.start_sent = time.perf_counter()  # started by the other player
+            self.stats.games += 1
+            self.game_over.clear()
+            self.running.set()
+
+        @sio.on('pong_update')
+        def on_update(data):
+            self._record_frame(data)
+
+        @sio.on('pong_game_over')
+        def on_over(data):
+            self.running.clear()
+            self.game_over.set()
+
+        @sio.on('error')
+        def on_error(data):
+            message = data.get('message') if isinstance(data, dict) else str(data)
+            self.stats.errors.append(message)
+
+    def _check_players(self, players):
+        if players and players.get('left') and players.get('right'):
+            self.opponent_ready.set()
+
+    def _record_frame(self, data):
+        now = time.perf_counter()
+        if isinstance(data, (bytes, bytearray)):
+            if len(data) != FRAME.size:
+                return
+            fields = FRAME.unpack(data)
+            tick, server_ms = fields[1], fields[2]
+            age_ms = ((int(time.time() * 1000) & 0xFFFFFFFF) - server_ms) & 0xFFFFFFFF
+            if age_ms > 0x7FFFFFFF:  # server clock slightly ahead
+                age_ms -= 0x100000000
+        else:
+            tick = data.get('t')
+            age_ms = int(time.time() * 1000) - data['st'] if 'st' in data else None  # keyframes only
+
+        stats = self.stats
+        with self.lock:
+            stats.frames += 1
+            if age_ms is not None:
+                stats.frame_age_ms.append(age_ms)
+            if self.start_sent is not None:
+                stats.start_ms.append((now - self.start_sent) * 1000)
+                self.start_sent = None
+            if self.last_arrival is not None:
+                interval = now - self.last_arrival
+                stats.intervals_ms.append(interval * 1000)
+                if self.frame_period and interval > self.frame_period * self.args.late_factor:
+                    stats.late += 1
+            if self.last_tick is not None and tick is not None and self.tick_step:
+                gap = tick - self.last_tick
+                if gap > self.tick_step:
+                    stats.dropped += gap // self.tick_step - 1
+            self.last_arrival = now
+            self.last_tick = tick
+
+    def _start_game(self):
+        with self.lock:
+            self.start_sent = time.perf_counter()
+        self.sio.emit('pong_start_game', {'room_id': self.room_id})
+
+    def _send_move(self, elapsed):
+        # Sweep the paddle up and down like a player following the ball
+        y = CANVAS_HEIGHT / 2 + math.sin(elapsed * 2.5 + self.phase) * 220
+        if self.args.wire == WIRE_BINARY:
+            payload = {'room_id': self.room_id, 'b': PADDLE_MOVE.pack(WIRE_VERSION, round(y * 2))}
+        else:
+            payload = {'room_id': self.room_id, 'y': round(y, 1)}
+        self.sio.emit('pong_paddle_move', payload)
+        self.stats.moves += 1
+
+    def run(self, deadline):
+        """Full client lifecycle; failures are recorded, never raised"""
+        try:
+            self.login()
+            if self.creator:
+                self.room_ready['room_id'] = self.create_room()
+                self.room_ready['event'].set()
+            elif not self.room_ready['event'].wait(timeout=max(0, deadline - time.time())):
+                raise RuntimeError("room never created")
+            self.room_id = self.room_ready['room_id']
+
+            self.sio.connect(self.base_url, transports=self.args.transports, wait_timeout=10)
+            self.join_sent = time.perf_counter()
+            self.sio.emit('join_room', {'room_id': self.room_id, 'wire': self.args.wire})
+            if not self.joined.wait(timeout=10):
+                raise RuntimeError("no pong_init within 10s")
+
+            if self.creator:
+                if not self.opponent_ready.wait(timeout=max(0, deadline - time.time())):
+                    raise RuntimeError("opponent never joined")
+                self._start_game()
+
+            period = 1.0 / self.args.move_hz
+            started = time.time()
+            next_move = started
+            while time.time() < deadline and self.sio.connected:
+                if self.creator and self.game_over.is_set():
+                    self.game_over.clear()
+                    self._start_game()
+                if self.running.is_set():
+                    self._send_move(time.time() - started)
+                next_move += period
+                time.sleep(max(0, next_move - time.time()))
+        except Exception as e:
+            self.stats.errors.append(str(e))
+        finally:
+            self.close()
+
+    def close(self):
+        try:
+            if self.sio.connected:
+                if self.room_id:
+                    # Stop state frames first so none is cut off mid-attachment by the disconnect
+                    self.sio.emit('leave_room', {'room_id': self.room_id})
+                    if self.creator:
+                        self.sio.emit('dissolve_room', {'room_id': self.room_id})
+                    time.sleep(0.2)
+                self.sio.disconnect()
+        except Exception:
+            pass
+
+
+def build_clients(count, args, level):
+    """Pair clients into PvP rooms (creator + guest) and solo vs Computer rooms"""
+    clients = []
+    rng = random.Random(args.seed + level)
+    index = 0
+    while len(clients) < count:
+        username = f"{args.prefix}{level}-{index}"
+        index += 1
+        remaining = count - len(clients)
+        if remaining == 1 or rng.random() < args.bot_ratio:
+            clients.append(LoadClient(args.url, username, 'bot', args))
+        else:
+            creator = LoadClient(args.url, username, 'pvp', args)
+            guest = LoadClient(args.url, f"{username}g", 'pvp', args,
+                               room_ready=creator.room_ready, creator=False)
+            clients.extend((creator, guest))
+    return clients
+
+
+def run_level(count, args, level):
+    clients = build_clients(count, args, level)
+    deadline = time.time() + args.ramp + args.duration
+    threads = []
+    for client in clients:
+        thread = threading.Thread(target=client.run, args=(deadline,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        if args.ramp:
+            time.sleep(args.ramp / len(clients))
+    for thread in threads:
+        thread.join(timeout=max(0, deadline - time.time()) + 15)
+    return summarize(count, clients, args)
+
+
+def summarize(count, clients, args):
+    stats = [c.stats for c in clients]
+    joins = [s.join_ms for s in stats if s.join_ms is not None]
+    starts = [ms for s in stats for ms in s.start_ms]
+    intervals = [ms for s in stats for ms in s.intervals_ms]
+    ages = [ms for s in stats for ms in s.frame_age_ms]
+    frames = sum(s.frames for s in stats)
+    late = sum(s.late for s in stats)
+    errors = {}
+    for s in stats:
+        for message in s.errors:
+            errors[message] = errors.get(message, 0) + 1
+    return {
+        'clients': count,
+        'joined': len(joins),
+        'failed': sum(1 for s in stats if s.join_ms is None),
+        'games_started': sum(s.games for s in stats),
+        'join_ms': _spread(joins),
+        'start_to_first_update_ms': _spread(starts),
+        'update_interval_ms': dict(_spread(intervals), stdev=round(statistics.pstdev(intervals), 2) if intervals else 0.0),
+        'frame_age_ms': _spread(ages),
+        'frames': frames,
+        'dropped_frames': sum(s.dropped for s in stats),
+        'late_frames': late,
+        'late_ratio': round(late / frames, 4) if frames else 0.0,
+        'moves_sent': sum(s.moves for s in stats),
+        'errors': errors,
+    }
+
+
+def _spread(values):
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+        'max': round(max(values), 2) if values else 0.0,
+    }
+
+
+def print_report(results, args):
+    print()
+    print(f"Pong load test against {args.url} ({args.wire} wire, {args.broadcast_hz} Hz, "
+          f"{args.move_hz} moves/s, {args.duration}s per level)")
+    header = (f"{'clients':>8} {'joined':>7} {'join p99':>9} {'start p99':>10} {'intvl p50':>10} "
+              f"{'intvl p99':>10} {'jitter':>7} {'age p99':>8} {'dropped':>8} {'late %':>7}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['clients']:>8} {r['joined']:>7} {r['join_ms']['p99']:>9} {r['start_to_first_update_ms']['p99']:>10} "
+              f"{r['update_interval_ms']['p50']:>10} {r['update_interval_ms']['p99']:>10} "
+              f"{r['update_interval_ms']['stdev']:>7} {r['frame_age_ms']['p99']:>8} "
+              f"{r['dropped_frames']:>8} {r['late_ratio'] * 100:>7.2f}")
+        for message, n in sorted(r['errors'].items(), key=lambda item: -item[1])[:5]:
+            print(f"{'':>8} ! {n} x {message}")
+
+    behind = next((r for r in results if r['late_ratio'] > args.max_late_ratio or r['failed']), None)
+    if behind:
+        print(f"\nServer falling behind at {behind['clients']} clients "
+              f"(late {behind['late_ratio'] * 100:.2f}%, failed {behind['failed']})")
+    else:
+        print(f"\nNo level exceeded {args.max_late_ratio * 100:.1f}% late frames")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Socket.IO load generator for Pong multiplayer")
+    parser.add_argument('--url', default='http://localhost:5000', help='server base URL')
+    parser.add_argument('--clients', default='50', help='client count, or comma-separated levels to run in turn')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of play per level')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which clients connect')
+    parser.add_argument('--bot-ratio', type=float, default=0.5, help='share of rooms that are vs Computer')
+    parser.add_argument('--move-hz', type=float, default=30.0, help='paddle moves per second per client')
+    parser.add_argument('--wire', choices=(WIRE_JSON, WIRE_BINARY), default=WIRE_JSON)
+    parser.add_argument('--broadcast-hz', type=int, default=20, choices=(10, 20, 30))
+    parser.add_argument('--win-points', type=int, default=20, help='long games keep rooms busy')
+    parser.add_argument('--late-factor', type=float, default=2.0,
+                        help='a frame is late when it arrives this many broadcast periods after the previous one')
+    parser.add_argument('--max-late-ratio', type=float, default=0.01, help='late share that counts as falling behind')
+    parser.add_argument('--transport', choices=('websocket', 'polling', 'any'), default='any')
+    parser.add_argument('--prefix', default='load', help='username prefix for generated users')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+    args.transports = None if args.transport == 'any' else [args.transport]
+
+    levels = [int(n) for n in args.clients.split(',') if n.strip()]
+    results = []
+    for level, count in enumerate(levels):
+        print(f"Running {count} clients...", file=sys.stderr)
+        results.append(run_level(count, args, level))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+In-memory lobby room directory
+
+The dashboard renders from a RoomDirectory instead of querying every Room
+(and its creator) per request. It is loaded once from a single joined query
+and then kept current by the lobby notification helpers (room created,
+updated, dissolved). EmptyRoomQueue orders rooms nobody is
+connected to for the background reaper, and LobbyDiff batches lobby changes
+into periodic lobby_diff broadcasts.
+"""
+import bisect
+import heapq
+from datetime import datetime
+
+SORTS = ('created', 'players')
+ROOM_CAPACITY = {'pvp': 2, 'bot': 1}  # humans per room; vs Computer rooms are creator-only
+_EPOCH = datetime(1970, 1, 1)
+
+
+def sort_key(entry, sort):
+    """Total order used for sorting and cursors: (players,) created time, room id"""
+    created = (entry.created_at - _EPOCH).total_seconds() if entry.created_at else 0.0
+    if sort == 'players':
+        return (entry.players, created, entry.id)
+    return (created, entry.id)
+
+
+class RoomEntry:
+    """What the lobby shows about one room"""
+    __slots__ = ('id', 'name', 'type', 'mode', 'win_points', 'created_by', 'players', 'created_at')
+
+    def __init__(self, id, name, type, mode, win_points, created_by, players=0, created_at=None):
+        self.id = id
+        self.name = name
+        self.type = type  # 'public' or 'private'
+        self.mode = mode  # 'pvp' or 'bot'
+        self.win_points = win_points
+        self.created_by = created_by  # creator username
+        self.players = players  # live member count
+        self.created_at = created_at
+
+    def has_free_slot(self):
+        return self.players < ROOM_CAPACITY.get(self.mode, 2)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'type': self.type,
+            'mode': self.mode,
+            'players': self.players,
+            'win_points': self.win_points,
+            'created_by': self.created_by
+        }
+
+
+class RoomDirectory:
+    """Lobby listing of every room, in creation order
+
+    version goes up on every change; /api/rooms uses it as the ETag.
+    """
+
+    def __init__(self):
+        self.rooms = {}  # room_id -> RoomEntry
+        self.loaded = False
+        self.version = 0
+        self._sorted = {}  # sort -> (version, keys, entries), ascending
+
+    def load(self, rows, player_counts):
+        """Replace the directory from (Room, creator username) rows"""
+        self.rooms = {}
+        for room, creator_name in rows:
+            self.rooms[room.id] = RoomEntry(
+                room.id, room.name, room.type, room.mode,
+                getattr(room, 'win_points', None) or 5,
+                creator_name or "Unknown",
+                player_counts.get(room.id, 0),
+                room.created_at
+            )
+        self.loaded = True
+        self.version += 1
+
+    def add(self, entry):
+        self.rooms[entry.id] = entry
+        self.version += 1
+
+    def set_players(self, room_id, players):
+        entry = self.rooms.get(room_id)
+        if entry and entry.players != players:
+            entry.players = players
+            self.version += 1
+
+    def remove(self, room_id):
+        entry = self.rooms.pop(room_id, None)
+        if entry:
+            self.version += 1
+        return entry
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __iter__(self):
+        return iter(self.rooms.values())
+
+    def page(self, sort='created', descending=True, cursor=None, limit=20, mode=None, type=None, free_slot=False):
+        """One page of rooms matching the filters, plus the cursor of the next page (or None)
+
+        The cursor is the sort key of the last room returned, so pages stay
+        stable while rooms are added or removed in between requests.
+        """
+        keys, entries = self._ordered(sort)
+        if descending:
+            end = bisect.bisect_left(keys, cursor) if cursor is not None else len(keys)
+            positions = range(end - 1, -1, -1)
+        else:
+            start = bisect.bisect_right(keys, cursor) if cursor is not None else 0
+            positions = range(start, len(keys))
+
+        matches = []
+        for i in positions:
+            entry = entries[i]
+            if mode and entry.mode != mode:
+                continue
+            if type and entry.type != type:
+                continue
+            if free_slot and not entry.has_free_slot():
+                continue
+            if len(matches) == limit:
+                return matches, sort_key(matches[-1], sort)
+            matches.append(entry)
+        return matches, None
+
+    def _ordered(self, sort):
+        """Sort keys and entries in ascending order, cached until the next change"""
+        cached = self._sorted.get(sort)
+        if cached and cached[0] == self.version:
+            return cached[1], cached[2]
+        pairs = sorted((sort_key(entry, sort), entry) for entry in self.rooms.values())
+        keys = [key for key, _ in pairs]
+        entries = [entry for _, entry in pairs]
+        self._sorted[sort] = (self.version, keys, entries)
+        return keys, entries
+
+
+class EmptyRoomQueue:
+    """Rooms nobody is connected to, ordered by the moment they became empty
+
+    A heap of (empty_since, room_id); a room that fills up again is dropped
+    from empty_since and its heap entry is skipped when it surfaces.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl  # seconds a room may stay empty
+        self.heap = []
+        self.empty_since = {}  # room_id -> time it became empty
+
+    def mark_empty(self, room_id, since):
+        if room_id in self.empty_since:
+            return
+        self.empty_since[room_id] = since
+        heapq.heappush(self.heap, (since, room_id))
+
+    def mark_occupied(self, room_id):
+        if self.empty_since.pop(room_id, None) is not None and len(self.heap) > 2 * len(self.empty_since) + 64:
+            # Mostly stale entries; rebuild so the heap stays proportional to empty rooms
+            self.heap = [(since, rid) for rid, since in self.empty_since.items()]
+            heapq.heapify(self.heap)
+
+    def pop_expired(self, now, limit):
+        """Up to limit room ids whose TTL ran out, oldest first"""
+        expired = []
+        heap = self.heap
+        while heap and len(expired) < limit and heap[0][0] + self.ttl <= now:
+            since, room_id = heapq.heappop(heap)
+            if self.empty_since.get(room_id) == since:
+                del self.empty_since[room_id]
+                expired.append(room_id)
+        return expired
+
+    def __contains__(self, room_id):
+        return room_id in self.empty_since
+
+    def __len__(self):
+        return len(self.empty_since)
+
+
+class LobbyDiff:
+    """Lobby changes since the last lobby_diff broadcast, coalesced per room
+
+    A room created and dissolved within one window never reaches clients, and
+    repeated player-count changes collapse to the latest value.
+    """
+
+    def __init__(self):
+        self.created = {}  # room_id -> room dict
+        self.updated = {}  # room_id -> player count
+        self.started = set()  # room ids whose game started
+        self.dissolved = set()
+
+    def room_created(self, room):
+        self.dissolved.discard(room['id'])
+        self.created[room['id']] = room
+
+    def room_updated(self, room_id, players):
+        if room_id in self.created:
+            self.created[room_id]['players'] = players
+        else:
+            self.updated[room_id] = players
+
+    def game_started(self, room_id):
+        self.started.add(room_id)
+
+    def room_dissolved(self, room_id):
+        self.updated.pop(room_id, None)
+        self.started.discard(room_id)
+        if self.created.pop(room_id, None) is None:
+            self.dissolved.add(room_id)
+
+    def __bool__(self):
+        return bool(self.created or self.updated or self.started or self.dissolved)
+
+    def take(self):
+        """The pending lobby_diff payload (or None), clearing it"""
+        if not self:
+            return None
+        payload = {
+            'created': list(self.created.values()),
+            'updated': self.updated,
+            'started': list(self.started),
+            'dissolved': list(self.dissolved)
+        }
+        self.created = {}
+        self.updated = {}
+        self.started = set()
+        self.dissolved = set()
+        return payload
@@ -0,0 +1,203 @@
+"""
+Prometheus text-format metrics for the Pong server
+
+Counters, gauges and histograms are plain objects with __slots__ whose
+updates are a few attribute additions, so they can be touched every tick.
+No locks are taken: the server runs on eventlet green threads within one OS
+thread, and an update never yields in the middle. Values that are cheaper to
+read than to track (room counts, connected sockets) are callback gauges
+evaluated when /metrics is scraped.
+
+    registry = MetricsRegistry()
+    ticks = registry.counter('pong_ticks_total', 'Simulation ticks')
+    ticks.inc()
+    db_seconds = registry.histogram('pong_db_query_seconds', 'DB latency', ('path',))
+    with db_seconds.labels('join').time():
+        ...
+    registry.render()  # exposition text for GET /metrics
+"""
+import bisect
+import math
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; 1/60 s is the simulation tick budget
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 1 / 60, 0.033, 0.066, 0.125, 0.25, 0.5, 1.0)
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class Histogram:
+    """Observations counted into fixed buckets (upper bounds, inclusive)"""
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class MetricFamily:
+    """One metric name with its HELP/TYPE lines and a child per label value tuple"""
+
+    def __init__(self, name, help, kind, labelnames=(), factory=None, callback=None):
+        self.name = name
+        self.help = help
+        self.kind = kind  # 'counter', 'gauge' or 'histogram'
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self.callback = callback  # () -> value, or {label values: value}, read at scrape time
+        self.children = {}
+
+    def labels(self, *values):
+        """Child metric for these label values (created on first use)"""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self.children[values] = self.factory()
+        return child
+
+    def samples(self):
+        """(suffix, labels, value) for every exposed series"""
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            for label_values, value in sorted(values.items()):
+                yield '', self._labels(label_values), value
+            return
+        for label_values, child in sorted(self.children.items()):
+            labels = self._labels(label_values)
+            if self.kind != 'histogram':
+                yield '', labels, child.value
+                continue
+            cumulative = 0
+            for bound, count in zip(child.bounds + (math.inf,), child.counts):
+                cumulative += count
+                yield '_bucket', labels + [('le', _number(bound))], cumulative
+            yield '_sum', labels, child.sum
+            yield '_count', labels, child.count
+
+    def _labels(self, values):
+        if not isinstance(values, tuple):
+            values = (values,)
+        return list(zip(self.labelnames, values))
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class MetricsRegistry:
+    """Every metric the server exposes, in registration order"""
+
+    def __init__(self):
+        self.families = []
+
+    def _register(self, family):
+        self.families.append(family)
+        # Unlabelled metrics are used directly rather than through labels()
+        return family if family.labelnames or family.callback else family.labels()
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(MetricFamily(name, help, 'counter', labelnames, Counter))
+
+    def gauge(self, name, help, labelnames=(), callback=None):
+        return self._register(MetricFamily(name, help, 'gauge', labelnames, Gauge, callback))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(MetricFamily(name, help, 'histogram', labelnames,
+                                           lambda: Histogram(tuple(buckets))))
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        for family in self.families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in family.samples():
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+                series = f"{family.name}{suffix}{{{label_text}}}" if label_text else family.name + suffix
+                lines.append(f"{series} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_socketio(server, events, event_bytes):
+    """Count every outgoing Socket.IO event and its encoded size, per event name
+
+    Replaces server._send_packet with an equivalent that records the packet
+    it already encodes, so the size costs no extra encoding.
+    """
+    from socketio import packet
+
+    def _send_packet(eio_sid, pkt):
+        encoded_packet = pkt.encode()
+        if pkt.packet_type in (packet.EVENT, packet.BINARY_EVENT) and pkt.data:
+            event = pkt.data[0]
+            size = sum(map(len, encoded_packet)) if isinstance(encoded_packet, list) else len(encoded_packet)
+            events.labels(event).inc()
+            event_bytes.labels(event).inc(size)
+        if isinstance(encoded_packet, list):
+            for ep in encoded_packet:
+                server.eio.send(eio_sid, ep)
+        else:
+            server.eio.send(eio_sid, encoded_packet)
+
+    server._send_packet = _send_packet
@@ -0,0 +1,372 @@
+"""
+Vectorized batch physics for Pong rooms
+
+Keeps ball, paddle, score and computer AI state for every running room in
+contiguous NumPy arrays (one row per room) and advances all of them with a
+single array pass per tick. The rules mirror update_ball_position,
+update_computer_paddle, check_winner and reset_ball in pong_sim.py. Batch
+rooms share one NumPy generator, so they are not replayable per room.
+"""
+import math
+
+from pong_state import AIState
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; run.py falls back to per-room physics
+    np = None
+
+# Constants to match client rendering
+BALL_RADIUS = 8
+CANVAS_WIDTH = 800
+CANVAS_HEIGHT = 600
+LEFT_PADDLE_X = 10
+RIGHT_PADDLE_X = CANVAS_WIDTH - 20
+PADDLE_WIDTH = 10
+PADDLE_HEIGHT = 80
+MAX_BALL_SPEED = 12
+MAX_BOUNCE_ANGLE = math.pi / 6
+
+# Computer paddle tuning (same values as pong_sim.update_computer_paddle)
+AI_FACE_X = {'left': LEFT_PADDLE_X + PADDLE_WIDTH + BALL_RADIUS, 'right': RIGHT_PADDLE_X - BALL_RADIUS}
+AI_CENTER_Y = (CANVAS_HEIGHT - PADDLE_HEIGHT) // 2
+AI_AIM_ERROR = 12
+AI_MISS_CHANCE = 0.05
+AI_MISS_ERROR = 40
+AI_MAX_VELOCITY = 1.5
+AI_ACCELERATION = 0.15
+AI_GAIN = 0.08
+
+# Scoring side codes returned by step()
+NO_SCORE = 0
+LEFT = 1
+RIGHT = 2
+SIDE_NAMES = {LEFT: 'left', RIGHT: 'right'}
+
+# Computer paddle columns, one set per side: left_ai_target, right_ai_target, ...
+_AI_FLOAT_FIELDS = ('ai_target', 'ai_velocity', 'ai_intercept', 'ai_aim_dx', 'ai_aim_dy', 'ai_error')
+_AI_INT_FIELDS = ('ai_delay',)
+# Per-room float columns
+_FLOAT_FIELDS = (('ball_x', 'ball_y', 'ball_dx', 'ball_dy', 'left_y', 'right_y') +
+                 tuple(f'{side}_{name}' for side in ('left', 'right') for name in _AI_FLOAT_FIELDS))
+# Per-room integer columns
+_INT_FIELDS = (('score_left', 'score_right', 'win_points', 'serve_ticks', 'serve_side') +
+               tuple(f'{side}_{name}' for side in ('left', 'right') for name in _AI_INT_FIELDS))
+# Per-room flags: which paddles the computer drives
+_BOOL_FIELDS = ('bot_left', 'bot_right')
+
+
+def numpy_available():
+    """Return True when numpy can be imported"""
+    return np is not None
+
+
+class BatchPhysics:
+    """Structure-of-arrays physics engine stepping every registered room at once"""
+
+    def __init__(self, capacity=64, serve_ticks=60, rng=None):
+        if np is None:
+            raise RuntimeError("numpy is required for batch physics")
+        self.capacity = capacity
+        self.count = 0
+        self.serve_delay_ticks = serve_ticks
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.slots = {}  # room_id -> row index
+        self.room_ids = []  # row index -> room_id
+        for name in _FLOAT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        for name in _INT_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.int64))
+        for name in _BOOL_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=bool))
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, room_id):
+        return room_id in self.slots
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name in _FLOAT_FIELDS + _INT_FIELDS + _BOOL_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=old.dtype)
+            grown[:self.capacity] = old
+            setattr(self, name, grown)
+        self.capacity = new_capacity
+
+    def add(self, room_id, game_state, win_points=5, bot_left=False, bot_right=False):
+        """Register a room and load its current GameState into the arrays"""
+        if room_id in self.slots:
+            self.remove(room_id)
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        self.count += 1
+        self.slots[room_id] = i
+        self.room_ids.append(room_id)
+
+        ball = game_state.ball
+        self.ball_x[i] = ball.x
+        self.ball_y[i] = ball.y
+        self.ball_dx[i] = ball.dx
+        self.ball_dy[i] = ball.dy
+        self.left_y[i] = game_state.left.y
+        self.right_y[i] = game_state.right.y
+        self.score_left[i] = game_state.score.left
+        self.score_right[i] = game_state.score.right
+        self.win_points[i] = win_points
+        self.bot_left[i] = bot_left
+        self.bot_right[i] = bot_right
+        self.serve_ticks[i] = 0
+        self.serve_side[i] = NO_SCORE
+
+        for side, bot in (('left', bot_left), ('right', bot_right)):
+            ai_state = game_state.paddle(side).ai_state
+            new_ai = ai_state is None
+            if new_ai:
+                ai_state = AIState()
+            self._column(side, 'ai_target')[i] = ai_state.target_y
+            self._column(side, 'ai_velocity')[i] = ai_state.current_velocity
+            self._column(side, 'ai_delay')[i] = ai_state.reaction_delay
+            self._column(side, 'ai_intercept')[i] = ai_state.intercept_y
+            self._column(side, 'ai_aim_dx')[i] = ai_state.aim_dx
+            self._column(side, 'ai_aim_dy')[i] = ai_state.aim_dy
+            self._column(side, 'ai_error')[i] = ai_state.aim_error
+            if new_ai and bot:
+                self._roll_aim_error(side, np.array([i]))  # the match's first rally
+        return i
+
+    def _column(self, side, name):
+        """The 'left' or 'right' computer paddle's column of an AI field"""
+        return getattr(self, f'{side}_{name}')
+
+    def remove(self, room_id):
+        """Unregister a room, moving the last row into its slot"""
+        i = self.slots.pop(room_id, None)
+        if i is None:
+            return
+        last = self.count - 1
+        if i != last:
+            for name in _FLOAT_FIELDS + _INT_FIELDS + _BOOL_FIELDS:
+                column = getattr(self, name)
+                column[i] = column[last]
+            moved_id = self.room_ids[last]
+            self.room_ids[i] = moved_id
+            self.slots[moved_id] = i
+        self.room_ids.pop()
+        self.count = last
+
+    def set_paddle(self, room_id, side, y):
+        """Write a human paddle position into the arrays"""
+        i = self.slots.get(room_id)
+        if i is None:
+            return
+        if side == 'left':
+            self.left_y[i] = y
+        else:
+            self.right_y[i] = y
+
+    def export(self, room_id, game_state):
+        """Write a room's row back into its GameState (for broadcasts)"""
+        i = self.slots[room_id]
+        ball = game_state.ball
+        ball.x = float(self.ball_x[i])
+        ball.y = float(self.ball_y[i])
+        ball.dx = float(self.ball_dx[i])
+        ball.dy = float(self.ball_dy[i])
+        game_state.left.y = float(self.left_y[i])
+        game_state.right.y = float(self.right_y[i])
+        game_state.score.left = int(self.score_left[i])
+        game_state.score.right = int(self.score_right[i])
+        for side, bots in (('left', self.bot_left), ('right', self.bot_right)):
+            if not bots[i]:
+                continue
+            paddle = game_state.paddle(side)
+            ai_state = paddle.ai_state
+            if ai_state is None:
+                ai_state = paddle.ai_state = AIState()
+            ai_state.target_y = float(self._column(side, 'ai_target')[i])
+            ai_state.current_velocity = float(self._column(side, 'ai_velocity')[i])
+            ai_state.reaction_delay = int(self._column(side, 'ai_delay')[i])
+            ai_state.intercept_y = float(self._column(side, 'ai_intercept')[i])
+            ai_state.aim_dx = float(self._column(side, 'ai_aim_dx')[i])
+            ai_state.aim_dy = float(self._column(side, 'ai_aim_dy')[i])
+            ai_state.aim_error = float(self._column(side, 'ai_error')[i])
+
+    def step(self):
+        """
+        Advance every room by one fixed step.
+
+        Returns a list of (room_id, scoring_side, winner_side) for rooms that
+        scored this tick; winner_side is None until a side reaches win_points.
+        """
+        n = self.count
+        if n == 0:
+            return []
+
+        # Serving phase: rooms waiting after a point skip ball physics, paddles stay live
+        serving = self.serve_ticks[:n] > 0
+        if serving.any():
+            self.serve_ticks[:n][serving] -= 1
+            self._serve(np.flatnonzero(serving & (self.serve_ticks[:n] == 0)))
+        active = ~serving
+
+        scored = self._step_ball(n, active)
+        for side, bots in (('left', self.bot_left[:n]), ('right', self.bot_right[:n])):
+            if bots.any():
+                self._step_ai(n, bots, side)
+
+        if not scored.any():
+            return []
+        events = []
+        for i in np.flatnonzero(scored):
+            side = int(self.serve_side[i])
+            winner = None
+            if self.score_left[i] >= self.win_points[i]:
+                winner = 'left'
+            elif self.score_right[i] >= self.win_points[i]:
+                winner = 'right'
+            events.append((self.room_ids[i], SIDE_NAMES[side], winner))
+        return events
+
+    def _serve(self, rows):
+        """Reset balls to the center, served towards the side that just scored"""
+        if rows.size == 0:
+            return
+        self.ball_x[rows] = CANVAS_WIDTH / 2
+        self.ball_y[rows] = CANVAS_HEIGHT / 2
+        self.ball_dx[rows] = np.where(self.serve_side[rows] == RIGHT, 4.0, -4.0)
+        self.ball_dy[rows] = self.rng.choice(np.array([-2.0, -1.0, 1.0, 2.0]), size=rows.size)
+        self.serve_side[rows] = NO_SCORE
+        # A new rally: how well each computer paddle reads it
+        for side, bots in (('left', self.bot_left), ('right', self.bot_right)):
+            served = rows[bots[rows]]
+            if served.size:
+                self._roll_aim_error(side, served)
+
+    def _roll_aim_error(self, side, rows):
+        """Misjudgement the computer paddles on one side keep for a whole rally"""
+        rng = self.rng
+        error = self._column(side, 'ai_error')
+        error[rows] = rng.uniform(-AI_AIM_ERROR, AI_AIM_ERROR, size=rows.size)
+        missed = rows[rng.random(rows.size) < AI_MISS_CHANCE]
+        if missed.size:
+            error[missed] += rng.uniform(-AI_MISS_ERROR, AI_MISS_ERROR, size=missed.size)
+
+    def _step_ball(self, n, active):
+        """Move balls, resolve wall and paddle collisions; return the scored mask"""
+        x = self.ball_x[:n]
+        y = self.ball_y[:n]
+        dx = self.ball_dx[:n]
+        dy = self.ball_dy[:n]
+        r = BALL_RADIUS
+
+        x += np.where(active, dx, 0.0)
+        y += np.where(active, dy, 0.0)
+
+        # Top and bottom walls
+        top = active & (y <= r)
+        bottom = active & ~top & (y >= CANVAS_HEIGHT - r)
+        y[top] = r
+        dy[top] = np.abs(dy[top])
+        y[bottom] = CANVAS_HEIGHT - r
+        dy[bottom] = -np.abs(dy[bottom])
+
+        # Left paddle
+        left_y = self.left_y[:n]
+        hit = (active & (x - r <= LEFT_PADDLE_X + PADDLE_WIDTH) & (x + r >= LEFT_PADDLE_X) &
+               (y + r >= left_y) & (y - r <= left_y + PADDLE_HEIGHT))
+        if hit.any():
+            x[hit] = LEFT_PADDLE_X + PADDLE_WIDTH + r
+            new_dx, new_dy = self._bounce(left_y[hit], y[hit], dx[hit], dy[hit])
+            new_dx = np.abs(new_dx)
+            dx[hit] = np.where(new_dx < 2, np.where(new_dx > 0, 2.0, -2.0), new_dx)
+            dy[hit] = new_dy
+
+        # Right paddle
+        right_y = self.right_y[:n]
+        hit = (active & (x + r >= RIGHT_PADDLE_X) & (x - r <= RIGHT_PADDLE_X + PADDLE_WIDTH) &
+               (y + r >= right_y) & (y - r <= right_y + PADDLE_HEIGHT))
+        if hit.any():
+            x[hit] = RIGHT_PADDLE_X - r
+            new_dx, new_dy = self._bounce(right_y[hit], y[hit], dx[hit], dy[hit])
+            new_dx = -np.abs(new_dx)
+            dx[hit] = np.where(np.abs(new_dx) < 2, np.where(new_dx > 0, 2.0, -2.0), new_dx)
+            dy[hit] = new_dy
+
+        # Scoring (ball went past either boundary)
+        right_scored = active & (x < -r * 2)
+        left_scored = active & ~right_scored & (x > CANVAS_WIDTH + r * 2)
+        self.score_right[:n] += right_scored
+        self.score_left[:n] += left_scored
+        scored = right_scored | left_scored
+        if scored.any():
+            self.serve_side[:n][right_scored] = RIGHT
+            self.serve_side[:n][left_scored] = LEFT
+            self.serve_ticks[:n][scored] = self.serve_delay_ticks
+        return scored
+
+    @staticmethod
+    def _bounce(paddle_y, y, dx, dy):
+        """Bounce angle from where the ball met the paddle, with capped speed-up"""
+        half = PADDLE_HEIGHT / 2
+        relative = np.clip(((paddle_y + half) - y) / half, -0.8, 0.8)
+        angle = relative * MAX_BOUNCE_ANGLE
+        speed = np.minimum(np.sqrt(dx * dx + dy * dy) * 1.02, MAX_BALL_SPEED)
+        return speed * np.cos(angle), -speed * np.sin(angle)
+
+    def _step_ai(self, n, bots, side):
+        """Computer paddles on one side: cached closed-form intercept, aim error per rally, smooth movement"""
+        rng = self.rng
+        x = self.ball_x[:n]
+        y = self.ball_y[:n]
+        dx = self.ball_dx[:n]
+        dy = self.ball_dy[:n]
+        target = self._column(side, 'ai_target')[:n]
+        delay = self._column(side, 'ai_delay')[:n]
+        aim_dx = self._column(side, 'ai_aim_dx')[:n]
+        aim_dy = self._column(side, 'ai_aim_dy')[:n]
+        intercept = self._column(side, 'ai_intercept')[:n]
+        error = self._column(side, 'ai_error')[:n]
+
+        # Ball moving towards the computer
+        incoming = dx < 0 if side == 'left' else dx > 0
+        chasing = bots & incoming
+        # Predict again only where the velocity changed (serve, paddle or wall bounce)
+        changed = chasing & ((dx != aim_dx) | (dy != aim_dy))
+        if changed.any():
+            ticks = (AI_FACE_X[side] - x[changed]) / dx[changed]
+            band = CANVAS_HEIGHT - 2 * BALL_RADIUS
+            folded = np.mod(y[changed] + dy[changed] * ticks - BALL_RADIUS, 2 * band)
+            intercept[changed] = BALL_RADIUS + np.where(folded <= band, folded, 2 * band - folded)
+            aim_dx[changed] = dx[changed]
+            aim_dy[changed] = dy[changed]
+        waiting = chasing & (delay > 0)
+        delay[waiting] -= 1
+        ready = chasing & ~waiting
+        target[ready] = intercept[ready] + error[ready] - PADDLE_HEIGHT / 2
+
+        # Ball moving away: back to center, reacting to the next shot after a random delay
+        idle = bots & ~incoming
+        if idle.any():
+            target[idle] = AI_CENTER_Y
+            left = idle & (aim_dx != 0)
+            if left.any():
+                aim_dx[left] = 0
+                aim_dy[left] = 0
+                delay[left] = rng.integers(3, 9, size=int(left.sum()))
+
+        target[bots] = np.clip(target[bots], 0, CANVAS_HEIGHT - PADDLE_HEIGHT)
+
+        paddle = (self.left_y if side == 'left' else self.right_y)[:n]
+        velocity = self._column(side, 'ai_velocity')[:n]
+        current = paddle[bots]
+        v = velocity[bots]
+        target_velocity = np.clip((target[bots] - current) * AI_GAIN, -AI_MAX_VELOCITY, AI_MAX_VELOCITY)
+        v = np.where(target_velocity > v, np.minimum(target_velocity, v + AI_ACCELERATION),
+                     np.where(target_velocity < v, np.maximum(target_velocity, v - AI_ACCELERATION), v))
+        new_y = np.clip(current + v, 0, CANVAS_HEIGHT - PADDLE_HEIGHT)
+        v = np.where((new_y <= 0) | (new_y >= CANVAS_HEIGHT - PADDLE_HEIGHT), 0.0, v)
+        paddle[bots] = new_y
+        velocity[bots] = v
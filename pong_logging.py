@@ -0,0 +1,167 @@
+"""
+Structured logging for the Pong server
+
+Each subsystem logs through its own logger (pong.<subsystem>), so levels can
+be set per subsystem:
+
+  transport   Socket.IO / Engine.IO packets and dropped socket input
+  lobby       room directory, lobby_diff, room reaper, shard bus
+  join        join, leave and disconnect handling
+  simulation  scheduler, scoring, game start and end
+  server      startup, database and configuration
+
+A record is an event name plus key=value fields:
+
+  2026-01-01 12:00:00,000 INFO pong.join joined room=3f2a... user=alice paddle=right
+
+Configured from the environment by configure_logging():
+
+  PONG_LOG_LEVEL          level for every subsystem except transport (INFO)
+  PONG_LOG_<SUBSYSTEM>    per-subsystem level, e.g. PONG_LOG_SIMULATION=DEBUG
+  PONG_LOG_FORMAT         'text' (default) or 'json'
+
+Transport stays at WARNING unless PONG_LOG_TRANSPORT says otherwise, so the
+Socket.IO per-packet logs are off by default. Records on hot paths go
+through EventLogger.limited(), which emits at most one per interval.
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+SUBSYSTEMS = ('transport', 'lobby', 'join', 'simulation', 'server')
+DEFAULT_LEVEL = 'INFO'
+TRANSPORT_LEVEL = 'WARNING'
+LIMIT_INTERVAL = 1.0  # seconds between records of one rate-limited event
+
+
+def _field(value):
+    """Render one field value; strings with spaces, quotes or '=' are quoted"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    text = str(value)
+    if not text or any(c in text for c in ' "='):
+        return json.dumps(text)
+    return text
+
+
+class EventFormatter(logging.Formatter):
+    """'time LEVEL logger event key=value ...', or one JSON object per line"""
+
+    def __init__(self, as_json=False):
+        super().__init__('%(asctime)s %(levelname)s %(name)s %(message)s')
+        self.as_json = as_json
+
+    def formatMessage(self, record):
+        fields = getattr(record, 'fields', None)
+        line = super().formatMessage(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={_field(value)}" for key, value in fields.items())
+        return line
+
+    def format(self, record):
+        if not self.as_json:
+            return super().format(record)
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class EventLogger:
+    """Logs events with fields; nothing is formatted unless the level is enabled"""
+    __slots__ = ('logger', 'limits')
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.limits = {}  # key -> (time of last record, records suppressed since)
+
+    def enabled(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, event, exc_info=None, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        """Error record with the current exception's traceback"""
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+    def limited(self, level, event, interval=LIMIT_INTERVAL, key=None, **fields):
+        """At most one record per interval for key (default: the event name)
+
+        The next record that gets through carries suppressed=N for the ones
+        dropped in between.
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        key = event if key is None else key
+        now = time.monotonic()
+        last, suppressed = self.limits.get(key, (None, 0))
+        if last is not None and now - last < interval:
+            self.limits[key] = (last, suppressed + 1)
+            return
+        self.limits[key] = (now, 0)
+        if suppressed:
+            fields['suppressed'] = suppressed
+        self.logger.log(level, event, extra={'fields': fields})
+
+
+_loggers = {}
+
+
+def get_logger(subsystem):
+    """Shared EventLogger for one of SUBSYSTEMS"""
+    logger = _loggers.get(subsystem)
+    if logger is None:
+        logger = _loggers[subsystem] = EventLogger(logging.getLogger(f'pong.{subsystem}'))
+    return logger
+
+
+def transport_logger(name):
+    """Plain logger for a library's transport logs ('socketio', 'engineio')"""
+    return logging.getLogger(f'pong.transport.{name}')
+
+
+def configure_logging(environ=os.environ, stream=None, handler=None):
+    """Install one handler on the 'pong' logger and set subsystem levels; returns the handler"""
+    root = logging.getLogger('pong')
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    if handler is None:
+        handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(EventFormatter(environ.get('PONG_LOG_FORMAT', 'text').lower() == 'json'))
+    root.addHandler(handler)
+    root.propagate = False
+    default = environ.get('PONG_LOG_LEVEL', DEFAULT_LEVEL)
+    for subsystem in SUBSYSTEMS:
+        fallback = TRANSPORT_LEVEL if subsystem == 'transport' else default
+        set_level(environ.get(f'PONG_LOG_{subsystem.upper()}') or fallback, subsystem)
+    return handler
+
+
+def set_level(level, *subsystems):
+    """Set the level of the given subsystems (all of them when none are given)"""
+    if isinstance(level, str):
+        level = level.upper()
+    for subsystem in subsystems or SUBSYSTEMS:
+        logging.getLogger(f'pong.{subsystem}').setLevel(level)
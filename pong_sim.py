@@ -0,0 +1,301 @@
+"""
+Deterministic simulation core for one Pong room
+
+step() advances a room by exactly one tick. It depends only on the room's
+state, the paddle targets queued for that tick (room.pending_input) and the
+room's own random.Random seeded from room.seed. Nothing reads wall-clock
+time or the global random module, and serving delays count the room's match
+ticks (room.tick). Replaying a match's seed and per-tick inputs through
+step() therefore reproduces its scores and positions bit for bit, given
+the same platform's float math. That is the basis for replays, dispute
+checks and client-side lockstep prediction.
+
+run.py calls step() from the scheduler and only adds the Socket.IO side
+effects: point and game-over broadcasts.
+"""
+import math
+
+from pong_state import PHASE_PLAYING, PHASE_SERVING, AIState
+
+SERVE_TICKS = 60  # Ticks between a point and the next serve (1 s at 60 Hz)
+
+
+def apply_inputs(room):
+    """Move paddles to the latest target queued for each side; returns True if any moved"""
+    pending = room.pending_input
+    moved = False
+    for side in ('left', 'right'):
+        target_y = pending[side]
+        if target_y is None:
+            continue
+        pending[side] = None
+        room.game_state.paddle(side).y = target_y
+        moved = True
+    return moved
+
+
+def step(room, serve_ticks=SERVE_TICKS):
+    """Advance one room by a single tick; returns (scoring_side, winner_side), either may be None"""
+    apply_inputs(room)
+    room.tick += 1
+    game_state = room.game_state
+    rng = room.rng
+    scoring_side = None
+
+    # Serving phase after a point: skip ball physics until the deadline tick,
+    # while paddle input carries on as usual
+    if room.phase == PHASE_SERVING:
+        if room.tick >= room.serve_tick:
+            serve_ball(room, rng)
+    else:
+        # Update ball position and check for scoring
+        scoring_side = update_ball_position(game_state)
+        if scoring_side:
+            room.phase = PHASE_SERVING
+            room.serve_tick = room.tick + serve_ticks
+            room.serve_side = scoring_side
+
+    # Update computer paddles in bot mode with improved AI
+    if room.mode == 'bot':
+        if room.players.get('left') == 'Computer':
+            update_computer_paddle(game_state, 'left', rng)
+        if room.players.get('right') == 'Computer':
+            update_computer_paddle(game_state, 'right', rng)
+
+    # Check for winner using room's win_points
+    return scoring_side, check_winner(game_state.score, room.win_points)
+
+
+def serve_ball(room, rng):
+    """End the serving phase: ball back to center, heading towards the side that scored"""
+    game_state = room.game_state
+    ball = game_state.ball
+    reset_ball(ball, rng)
+    if room.serve_side == 'right':
+        ball.dx = abs(ball.dx)
+    else:
+        ball.dx = -abs(ball.dx)
+    room.phase = PHASE_PLAYING
+    room.serve_tick = None
+    room.serve_side = None
+    # A new rally: how well each computer paddle reads it
+    for paddle in (game_state.left, game_state.right):
+        if paddle.ai_state is not None:
+            roll_aim_error(paddle.ai_state, rng)
+
+
+def check_winner(score, win_points=5):
+    """Check if someone won (first to win_points)"""
+    if score.left >= win_points:
+        return 'left'
+    elif score.right >= win_points:
+        return 'right'
+    return None
+
+
+# Computer paddle. The ball's centre stays within BALL_RADIUS of the top and
+# bottom walls, and meets a paddle's face at AI_FACE_X[side]
+BALL_RADIUS = 8
+CANVAS_HEIGHT = 600
+PADDLE_HEIGHT = 80
+AI_FACE_X = {'left': 10 + 10 + BALL_RADIUS, 'right': 800 - 20 - BALL_RADIUS}
+AI_CENTER_Y = (CANVAS_HEIGHT - PADDLE_HEIGHT) // 2
+AI_AIM_ERROR = 12  # +/- px of error per rally
+AI_MISS_CHANCE = 0.05  # chance per rally of a bigger misjudgement
+AI_MISS_ERROR = 40
+AI_GAIN = 0.08
+AI_MAX_VELOCITY = 1.5
+AI_ACCELERATION = 0.15
+
+
+def predict_intercept(x, y, dx, dy, face_x):
+    """Ball centre y when it reaches face_x, with wall reflections folded in
+
+    Unfolded, the ball travels in a straight line. Reflecting that line
+    back into the band between the walls (a triangle wave of period twice
+    the band) gives the bounced position in closed form.
+    Returns (y, ticks until it gets there).
+    """
+    ticks = (face_x - x) / dx
+    low = BALL_RADIUS
+    band = CANVAS_HEIGHT - 2 * BALL_RADIUS
+    folded = (y + dy * ticks - low) % (2 * band)
+    return low + (folded if folded <= band else 2 * band - folded), ticks
+
+
+def roll_aim_error(ai_state, rng):
+    """Misjudgement the computer keeps for a whole rally"""
+    ai_state.aim_error = rng.uniform(-AI_AIM_ERROR, AI_AIM_ERROR)
+    if rng.random() < AI_MISS_CHANCE:
+        ai_state.aim_error += rng.uniform(-AI_MISS_ERROR, AI_MISS_ERROR)
+
+
+def update_computer_paddle(game_state, side, rng):
+    """Move a computer paddle towards where the ball will cross its face
+
+    The intercept is predicted in closed form only when the ball's velocity
+    changes (serve, paddle or wall bounce) and is cached in the paddle's
+    AIState. Aim error is rolled once per rally (see serve_ball). On other
+    ticks this is the smoothed move towards the cached target.
+    """
+    ball = game_state.ball
+    computer_paddle = game_state.paddle(side)
+    ai_state = computer_paddle.ai_state
+    if ai_state is None:
+        ai_state = computer_paddle.ai_state = AIState()
+        roll_aim_error(ai_state, rng)  # the match's first rally
+
+    if (ball.dx < 0) if side == 'left' else (ball.dx > 0):
+        if ball.dx != ai_state.aim_dx or ball.dy != ai_state.aim_dy:
+            ai_state.intercept_y, _ = predict_intercept(
+                ball.x, ball.y, ball.dx, ball.dy, AI_FACE_X[side])
+            ai_state.aim_dx = ball.dx
+            ai_state.aim_dy = ball.dy
+        # Reaction delay: keep the previous target for a few ticks
+        if ai_state.reaction_delay > 0:
+            ai_state.reaction_delay -= 1
+        else:
+            target_y = ai_state.intercept_y + ai_state.aim_error - PADDLE_HEIGHT / 2
+            ai_state.target_y = max(0, min(CANVAS_HEIGHT - PADDLE_HEIGHT, target_y))
+    else:
+        if ai_state.aim_dx != 0:
+            # Ball just left: forget the shot and react to the next one after a delay
+            ai_state.aim_dx = ai_state.aim_dy = 0
+            ai_state.reaction_delay = rng.randint(3, 8)
+        ai_state.target_y = AI_CENTER_Y
+
+    # Smooth movement: proportional speed, capped, with limited acceleration
+    current_y = computer_paddle.y
+    velocity = ai_state.current_velocity
+    target_velocity = max(-AI_MAX_VELOCITY, min(AI_MAX_VELOCITY, (ai_state.target_y - current_y) * AI_GAIN))
+    if target_velocity > velocity:
+        velocity = min(target_velocity, velocity + AI_ACCELERATION)
+    elif target_velocity < velocity:
+        velocity = max(target_velocity, velocity - AI_ACCELERATION)
+
+    new_y = current_y + velocity
+    if new_y <= 0 or new_y >= CANVAS_HEIGHT - PADDLE_HEIGHT:
+        # Stop at the walls
+        new_y = max(0, min(CANVAS_HEIGHT - PADDLE_HEIGHT, new_y))
+        velocity = 0
+    ai_state.current_velocity = velocity
+    computer_paddle.y = new_y
+
+
+def update_ball_position(game_state):
+    """Update ball position and handle collisions with improved physics"""
+    ball = game_state.ball
+    score = game_state.score
+    
+    # Update ball position
+    ball.x += ball.dx
+    ball.y += ball.dy
+    
+    # Constants to match client rendering - adjusted dimensions
+    ball_radius = 8
+    canvas_width = 800
+    canvas_height = 600  # Increased height for better proportions
+    left_paddle_x = 10
+    right_paddle_x = canvas_width - 20
+    paddle_width = 10
+    paddle_height = 80  # Slightly taller paddles
+
+    # Ball collision with top and bottom walls
+    if ball.y <= ball_radius:
+        ball.y = ball_radius
+        ball.dy = abs(ball.dy)  # Bounce down
+    elif ball.y >= canvas_height - ball_radius:
+        ball.y = canvas_height - ball_radius
+        ball.dy = -abs(ball.dy)  # Bounce up
+    
+    # Ball collision with paddles - improved collision detection
+    # Left paddle collision
+    if (ball.x - ball_radius <= left_paddle_x + paddle_width and 
+        ball.x + ball_radius >= left_paddle_x and 
+        ball.y + ball_radius >= game_state.left.y and 
+        ball.y - ball_radius <= game_state.left.y + paddle_height):
+        
+        # Ensure ball doesn't get stuck inside paddle
+        ball.x = left_paddle_x + paddle_width + ball_radius
+        
+        # Calculate relative intersection point (-1 to 1)
+        relative_intersect_y = (game_state.left.y + (paddle_height/2)) - ball.y
+        normalized_relative_intersection_y = relative_intersect_y / (paddle_height/2)
+        
+        # Clamp to prevent extreme angles
+        normalized_relative_intersection_y = max(-0.8, min(0.8, normalized_relative_intersection_y))
+        
+        # Calculate bounce angle (between -30 and 30 degrees for more controlled gameplay)
+        bounce_angle = normalized_relative_intersection_y * (math.pi/6)  # 30 degrees max angle
+        
+        # Calculate new direction with controlled speed increase
+        current_speed = math.sqrt(ball.dx**2 + ball.dy**2)
+        new_speed = min(current_speed * 1.02, 12)  # Max speed cap to prevent runaway
+        
+        ball.dx = new_speed * math.cos(bounce_angle)
+        ball.dy = -new_speed * math.sin(bounce_angle)
+        
+        # Ensure ball moves right after hitting left paddle
+        ball.dx = abs(ball.dx)
+        
+        # Ensure minimum horizontal speed to prevent vertical-only movement
+        if abs(ball.dx) < 2:
+            ball.dx = 2 if ball.dx > 0 else -2
+    
+    # Right paddle collision
+    if (ball.x + ball_radius >= right_paddle_x and 
+        ball.x - ball_radius <= right_paddle_x + paddle_width and 
+        ball.y + ball_radius >= game_state.right.y and 
+        ball.y - ball_radius <= game_state.right.y + paddle_height):
+        
+        # Ensure ball doesn't get stuck inside paddle
+        ball.x = right_paddle_x - ball_radius
+        
+        # Calculate relative intersection point (-1 to 1)
+        relative_intersect_y = (game_state.right.y + (paddle_height/2)) - ball.y
+        normalized_relative_intersection_y = relative_intersect_y / (paddle_height/2)
+        
+        # Clamp to prevent extreme angles
+        normalized_relative_intersection_y = max(-0.8, min(0.8, normalized_relative_intersection_y))
+        
+        # Calculate bounce angle (between -30 and 30 degrees for more controlled gameplay)
+        bounce_angle = normalized_relative_intersection_y * (math.pi/6)  # 30 degrees max angle
+        
+        # Calculate new direction with controlled speed increase
+        current_speed = math.sqrt(ball.dx**2 + ball.dy**2)
+        new_speed = min(current_speed * 1.02, 12)  # Max speed cap to prevent runaway
+        
+        ball.dx = -new_speed * math.cos(bounce_angle)
+        ball.dy = -new_speed * math.sin(bounce_angle)
+        
+        # Ensure ball moves left after hitting right paddle
+        ball.dx = -abs(ball.dx)
+        
+        # Ensure minimum horizontal speed to prevent vertical-only movement
+        if abs(ball.dx) < 2:
+            ball.dx = 2 if ball.dx > 0 else -2
+    
+    # Score points (ball went past boundaries)
+    if ball.x < -ball_radius*2:  # Ball went past left boundary
+        score.right += 1
+        return 'right'
+    elif ball.x > canvas_width + ball_radius*2:  # Ball went past right boundary
+        score.left += 1
+        return 'left'
+    
+    return None
+
+
+def reset_ball(ball, rng):
+    """Reset ball to center with controlled random direction"""
+    ball.x = 400  # Center of 800 width
+    ball.y = 300  # Center of 600 height
+    # Ensure non-zero dy for visible motion; controlled speed
+    ball.dx = rng.choice([-4, 4])  # Reduced speed for better control
+    ball.dy = rng.choice([-2, -1, 1, 2])  # Reduced vertical speed
+    
+    # Ensure minimum speeds to prevent stuck balls
+    if abs(ball.dx) < 2:
+        ball.dx = 2 if ball.dx > 0 else -2
+    if abs(ball.dy) < 1:
+        ball.dy = 1 if ball.dy > 0 else -1
@@ -0,0 +1,211 @@
+"""
+Compact in-memory game state for Pong rooms
+
+Every room in active_rooms is a RoomState built by new_room_state(). The
+classes use __slots__ so each room carries no per-instance __dict__, and
+GameState.to_wire() is the single place that decides what clients receive.
+"""
+import random
+
+from fanout import FrameCache
+from pong_wire import WIRE_BINARY, SnapshotEncoder
+
+# Starting positions (canvas is 800x600, paddles are 80 tall)
+BALL_START = (400, 300, 4, 2)  # x, y, dx, dy
+PADDLE_START_Y = 250
+
+# Match phases: ball in play, or waiting to be served again after a point
+PHASE_PLAYING = 'playing'
+PHASE_SERVING = 'serving'
+
+
+class Ball:
+    __slots__ = ('x', 'y', 'dx', 'dy')
+
+    def __init__(self, x=BALL_START[0], y=BALL_START[1], dx=BALL_START[2], dy=BALL_START[3]):
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+
+    def to_wire(self):
+        return {'x': self.x, 'y': self.y, 'dx': self.dx, 'dy': self.dy}
+
+
+class AIState:
+    """Computer paddle controller state (server-side only, never sent to clients)"""
+    __slots__ = ('target_y', 'current_velocity', 'reaction_delay', 'intercept_y', 'aim_dx', 'aim_dy',
+                 'aim_error')
+
+    def __init__(self, target_y=PADDLE_START_Y, current_velocity=0, reaction_delay=0):
+        self.target_y = target_y
+        self.current_velocity = current_velocity
+        self.reaction_delay = reaction_delay
+        self.intercept_y = PADDLE_START_Y  # predicted ball y at the paddle, cached...
+        self.aim_dx = 0  # ...for this ball velocity; 0 while the ball moves away
+        self.aim_dy = 0
+        self.aim_error = 0  # px of misjudgement, rolled once per rally
+
+
+class Paddle:
+    __slots__ = ('y', 'ai_state')
+
+    def __init__(self, y=PADDLE_START_Y):
+        self.y = y
+        self.ai_state = None  # AIState when driven by the computer
+
+    def to_wire(self):
+        return {'y': self.y}
+
+
+class Score:
+    __slots__ = ('left', 'right')
+
+    def __init__(self, left=0, right=0):
+        self.left = left
+        self.right = right
+
+    def to_wire(self):
+        return {'left': self.left, 'right': self.right}
+
+
+class GameState:
+    """Ball, both paddles and the score of one match"""
+    __slots__ = ('ball', 'left', 'right', 'score')
+
+    def __init__(self):
+        self.ball = Ball()
+        self.left = Paddle()
+        self.right = Paddle()
+        self.score = Score()
+
+    def paddle(self, side):
+        """Return the 'left' or 'right' paddle"""
+        return self.left if side == 'left' else self.right
+
+    def to_wire(self):
+        """Serialize for pong_* events; AI internals stay on the server"""
+        return {
+            'ball': self.ball.to_wire(),
+            'paddles': {'left': self.left.to_wire(), 'right': self.right.to_wire()},
+            'score': self.score.to_wire()
+        }
+
+
+class RoomState:
+    """Live state of one room in active_rooms"""
+    __slots__ = ('members', 'mode', 'win_points', 'players', 'game_state', 'game_running',
+                 'winner', 'room_creator', 'phase', 'serve_tick', 'serve_side', 'snapshots',
+                 'json_sids', 'binary_sids', 'pending_input', 'broadcast_hz', 'seed', 'rng', 'tick',
+                 'spectators', 'spectator_snapshots', 'frames')
+
+    def __init__(self, mode, win_points, room_creator, members=(), broadcast_hz=20, seed=None):
+        self.members = set(members)  # usernames currently in the room
+        self.mode = mode  # 'pvp' or 'bot'
+        self.win_points = win_points
+        self.players = {'left': None, 'right': None}  # in bot mode: left='Computer', right=username
+        self.game_state = GameState()
+        self.game_running = False
+        self.winner = None
+        self.room_creator = room_creator
+        self.phase = PHASE_PLAYING
+        self.serve_tick = None  # match tick at which the serving phase ends
+        self.serve_side = None  # side that scored the pending point
+        self.seed = None  # seed of the current match; with its inputs it replays the match
+        self.rng = None  # random.Random(seed): every random choice the simulation makes
+        self.tick = 0  # ticks simulated in the current match
+        self.reseed(seed)
+        self.snapshots = SnapshotEncoder()  # delta state for pong_update broadcasts
+        self.json_sids = set()  # sockets receiving JSON state frames
+        self.binary_sids = set()  # sockets that negotiated the binary wire
+        self.pending_input = {'left': None, 'right': None}  # latest paddle target per side
+        self.broadcast_hz = broadcast_hz  # pong_update frames per second
+        self.spectators = {}  # sid -> wire of read-only watchers; never in members or players
+        self.spectator_snapshots = SnapshotEncoder()  # delta state of the spectator frames
+        self.frames = FrameCache()  # events encoded for the current state; invalidated on change
+
+    def reseed(self, seed=None):
+        """Start the match random stream from seed (a fresh random seed by default)"""
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.tick = 0
+
+    def reset_game(self, seed=None):
+        """Fresh ball, paddles, score and random stream for a new match"""
+        self.reseed(seed)
+        self.game_state = GameState()
+        self.winner = None
+        self.phase = PHASE_PLAYING
+        self.serve_tick = None
+        self.serve_side = None
+        self.pending_input = {'left': None, 'right': None}
+        self.snapshots.request_keyframe()
+        self.spectator_snapshots.request_keyframe()
+        self.frames.invalidate()
+
+    def set_wire(self, sid, wire):
+        """Record which state-frame encoding a socket receives"""
+        if wire == WIRE_BINARY:
+            self.json_sids.discard(sid)
+            self.binary_sids.add(sid)
+        else:
+            self.binary_sids.discard(sid)
+            self.json_sids.add(sid)
+
+    def drop_sid(self, sid):
+        self.json_sids.discard(sid)
+        self.binary_sids.discard(sid)
+
+
+class MembershipIndex:
+    """Which sockets and users are in which rooms
+
+    Kept in step with join, leave, dissolve and disconnect so that handlers
+    only touch the rooms a socket was in instead of scanning active_rooms.
+    """
+    __slots__ = ('by_sid', 'by_user')
+
+    def __init__(self):
+        self.by_sid = {}  # sid -> (username, room_id, side)
+        self.by_user = {}  # username -> {room_id: set of that user's sids in the room}
+
+    def add(self, sid, username, room_id, side):
+        self.remove_sid(sid)  # a socket is in one room at a time
+        self.by_sid[sid] = (username, room_id, side)
+        self.by_user.setdefault(username, {}).setdefault(room_id, set()).add(sid)
+
+    def remove_sid(self, sid, room_id=None):
+        """Forget a socket (only if it is in room_id, when given); returns its entry or None"""
+        entry = self.by_sid.get(sid)
+        if entry is None or (room_id is not None and entry[1] != room_id):
+            return None
+        del self.by_sid[sid]
+        username, entry_room, _ = entry
+        rooms = self.by_user[username]
+        sids = rooms[entry_room]
+        sids.discard(sid)
+        if not sids:
+            del rooms[entry_room]
+            if not rooms:
+                del self.by_user[username]
+        return entry
+
+    def in_room(self, username, room_id):
+        """True while the user still has a socket (e.g. another tab) in the room"""
+        return room_id in self.by_user.get(username, ())
+
+    def remove_room(self, room_id, usernames):
+        """Forget every socket the given users had in a dissolved room"""
+        for username in usernames:
+            rooms = self.by_user.get(username)
+            if not rooms or room_id not in rooms:
+                continue
+            for sid in rooms.pop(room_id):
+                self.by_sid.pop(sid, None)
+            if not rooms:
+                del self.by_user[username]
+
+
+def new_room_state(mode, win_points=5, room_creator="Unknown", members=(), broadcast_hz=20, seed=None):
+    """Single factory for active_rooms entries"""
+    return RoomState(mode, win_points if win_points else 5, room_creator, members, broadcast_hz, seed)
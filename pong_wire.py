@@ -0,0 +1,103 @@
+"""
+Wire encoding for Pong state frames
+
+JSON clients get pong_update as either a keyframe ({'k': fields}) with every
+field or a delta ({'d': fields}) with only the fields that changed since the
+previous frame sent to the room. Every frame is stamped with the simulation
+tick ('t'). Keyframes also carry the server time in milliseconds ('st');
+deltas leave it out, since a 13-digit timestamp would cost more than the
+fields a typical delta carries. Positions are quantized to half pixels and
+velocities to hundredths so unchanged values compare equal and encode short.
+
+Clients that negotiate the binary wire at join_room instead get fixed-layout
+struct frames as Socket.IO binary attachments (little-endian):
+
+  pong_update        B version, I tick, I server ms (wrapping), h ball x, h ball y, h dx, h dy,
+                     h left paddle y, h right paddle y, B left score, B right score
+  pong_paddle_move   B version, h mouse y   (client -> server)
+
+Positions travel as half pixels (value * 2), velocities as hundredths.
+"""
+import struct
+
+KEYFRAME_INTERVAL = 20  # Full snapshot every N frames (once a second at 20 Hz)
+
+# Flat field names used on the wire, in snapshot order
+FIELDS = ('bx', 'by', 'vx', 'vy', 'lp', 'rp', 'ls', 'rs')
+
+
+def _half(value):
+    """Quantize to half-pixel precision (whole numbers stay ints)"""
+    q = round(value * 2)
+    return q // 2 if q % 2 == 0 else q / 2
+
+
+def _hundredth(value):
+    q = round(value * 100)
+    return q // 100 if q % 100 == 0 else q / 100
+
+
+def snapshot(game_state):
+    """Quantized tuple of the fields clients need to render a frame"""
+    ball = game_state.ball
+    score = game_state.score
+    return (
+        _half(ball.x), _half(ball.y), _hundredth(ball.dx), _hundredth(ball.dy),
+        _half(game_state.left.y), _half(game_state.right.y),
+        score.left, score.right
+    )
+
+
+class SnapshotEncoder:
+    """Per-room delta encoder remembering the last frame broadcast to the room"""
+    __slots__ = ('last', 'frames_since_keyframe')
+
+    def __init__(self):
+        self.last = None
+        self.frames_since_keyframe = 0
+
+    def request_keyframe(self):
+        """Force the next frame to be a full snapshot (e.g. someone joined)"""
+        self.last = None
+
+    def encode(self, game_state, tick=0, server_ms=0):
+        """Return the pong_update payload for the room's current state"""
+        snap = snapshot(game_state)
+        last = self.last
+        self.last = snap
+        if last is None or self.frames_since_keyframe >= KEYFRAME_INTERVAL:
+            self.frames_since_keyframe = 0
+            return {'t': tick, 'st': server_ms, 'k': dict(zip(FIELDS, snap))}
+        self.frames_since_keyframe += 1
+        changed = {field: value for field, value, old in zip(FIELDS, snap, last) if value != old}
+        return {'t': tick, 'd': changed}
+
+
+# Binary wire protocol
+WIRE_VERSION = 2
+WIRE_JSON = 'json'
+WIRE_BINARY = 'binary'
+FRAME = struct.Struct('<BIIhhhhhhBB')
+PADDLE_MOVE = struct.Struct('<Bh')
+
+
+def encode_frame(tick, server_ms, game_state):
+    """Fixed-size binary pong_update frame"""
+    ball = game_state.ball
+    score = game_state.score
+    return FRAME.pack(
+        WIRE_VERSION, tick & 0xFFFFFFFF, server_ms & 0xFFFFFFFF,
+        round(ball.x * 2), round(ball.y * 2), round(ball.dx * 100), round(ball.dy * 100),
+        round(game_state.left.y * 2), round(game_state.right.y * 2),
+        min(score.left, 255), min(score.right, 255)
+    )
+
+
+def decode_paddle_move(payload):
+    """Mouse y from a binary pong_paddle_move frame, or None if it is malformed"""
+    if not isinstance(payload, (bytes, bytearray)) or len(payload) != PADDLE_MOVE.size:
+        return None
+    version, y = PADDLE_MOVE.unpack(payload)
+    if version != WIRE_VERSION:
+        return None
+    return y / 2
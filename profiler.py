@@ -0,0 +1,160 @@
+"""
+On-demand sampling profiler for a live Pong server
+
+Under eventlet every green thread (the simulation scheduler, Socket.IO
+handlers, HTTP requests) runs on the server's one OS thread. A profile runs
+a real OS thread, from eventlet's unpatched _thread, that wakes HZ times a
+second. Each time it records the stack the server thread is executing,
+via sys._current_frames(). Nothing is installed in the server thread
+itself. The cost is one short stack walk per sample, the window and rate
+are capped, and only one profile runs at a time.
+
+When the window ends, two files are written to the profile directory:
+
+  <name>.collapsed   'frame;frame;frame count' lines (root first) for flamegraph.pl,
+                     speedscope or inferno
+  <name>.txt         samples per category and the top-N functions by self and
+                     total samples
+
+Categories come from the labels passed to start(): each sample gets the
+label of the innermost frame whose code object is labelled. Samples where
+the eventlet hub is waiting for I/O are 'idle'; anything else is 'other'.
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+try:
+    from eventlet import patcher
+    _thread = patcher.original('_thread')
+    _sleep = patcher.original('time').sleep
+except ImportError:  # plain threads when eventlet is not installed
+    import _thread
+    _sleep = time.sleep
+
+MAX_SECONDS = 60
+MAX_HZ = 250
+MAX_DEPTH = 128  # frames kept per sample, innermost first
+IDLE = 'idle'
+OTHER = 'other'
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(code):
+    return os.sep + 'hubs' + os.sep in code.co_filename and 'eventlet' in code.co_filename
+
+
+class SamplingProfiler:
+    """Samples one OS thread's stacks for a bounded window and writes the result"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.current = None  # name of the running profile
+        self.last = None  # summary dict of the last finished profile
+
+    @property
+    def running(self):
+        return self.current is not None
+
+    def start(self, seconds=10, hz=100, top=25, labels=None):
+        """Profile the calling OS thread; returns the profile name (RuntimeError if one is running)"""
+        if self.current is not None:
+            raise RuntimeError(f"profile {self.current} is already running")
+        seconds = max(0.1, min(float(seconds), MAX_SECONDS))
+        hz = max(1, min(int(hz), MAX_HZ))
+        os.makedirs(self.directory, exist_ok=True)
+        now = datetime.now()
+        name = f"profile-{now:%Y%m%d-%H%M%S}-{now.microsecond // 1000:03d}"  # ms keeps captures in the same second apart
+        self.current = name
+        _thread.start_new_thread(self._run, (_thread.get_ident(), name, seconds, hz, top, dict(labels or {})))
+        return name
+
+    def _run(self, thread_id, name, seconds, hz, top, labels):
+        stacks = {}  # tuple of code objects, innermost first -> samples
+        try:
+            interval = 1.0 / hz
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is None:
+                    break  # the profiled thread is gone
+                codes = []
+                while frame is not None and len(codes) < MAX_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                del frame
+                key = tuple(codes)
+                stacks[key] = stacks.get(key, 0) + 1
+                _sleep(interval)
+            self.last = self._write(name, stacks, labels, seconds, hz, top)
+        except Exception as e:
+            self.last = {'name': name, 'error': str(e)}
+        finally:
+            self.current = None
+
+    def _write(self, name, stacks, labels, seconds, hz, top):
+        total = sum(stacks.values())
+        categories = {}
+        self_samples = {}
+        total_samples = {}
+        collapsed = {}
+        for codes, count in stacks.items():
+            category = self._category(codes, labels)
+            categories[category] = categories.get(category, 0) + count
+            self_samples[codes[0]] = self_samples.get(codes[0], 0) + count
+            for code in set(codes):
+                total_samples[code] = total_samples.get(code, 0) + count
+            line = ';'.join(_frame_label(code) for code in reversed(codes))
+            collapsed[line] = collapsed.get(line, 0) + count
+
+        with open(os.path.join(self.directory, name + '.collapsed'), 'w') as f:
+            for line, count in sorted(collapsed.items()):
+                f.write(f"{line} {count}\n")
+
+        def ranked(samples):
+            return [(_frame_label(code), count) for code, count in
+                    sorted(samples.items(), key=lambda item: -item[1])[:top]]
+
+        summary = {
+            'name': name,
+            'seconds': seconds,
+            'hz': hz,
+            'samples': total,
+            'categories': dict(sorted(categories.items(), key=lambda item: -item[1])),
+            'top_self': ranked(self_samples),
+            'top_total': ranked(total_samples)
+        }
+        with open(os.path.join(self.directory, name + '.txt'), 'w') as f:
+            f.write(f"Profile {name}: {total} samples over {seconds} s at {hz} Hz\n\n")
+            f.write("Samples by category\n")
+            for category, count in summary['categories'].items():
+                f.write(f"  {_percent(count, total):>6}  {count:>7}  {category}\n")
+            for title, rows in (("self", summary['top_self']), ("total", summary['top_total'])):
+                f.write(f"\nTop {top} functions by {title} samples\n")
+                for label, count in rows:
+                    f.write(f"  {_percent(count, total):>6}  {count:>7}  {label}\n")
+        return summary
+
+    def _category(self, codes, labels):
+        if _is_idle(codes[0]):
+            return IDLE
+        for code in codes:
+            label = labels.get(code)
+            if label is not None:
+                return label
+        return OTHER
+
+    def files(self):
+        """Profile files in the directory, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [n for n in os.listdir(self.directory) if n.endswith(('.collapsed', '.txt'))]
+        return sorted(names, reverse=True)
+
+
+def _percent(count, total):
+    return f"{100.0 * count / total:.1f}%" if total else "0.0%"
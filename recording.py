@@ -0,0 +1,314 @@
+"""
+Compact match recordings
+
+The simulation is deterministic (see pong_sim.py), so a match is fully
+described by its seed and the paddle inputs applied on each tick. Each
+match is written to an append-only binary log holding exactly that, plus
+score events so a replay can be checked against what was played:
+
+  header   '<4sBH' magic b'PREC', format version, length of the JSON header
+           {match_id, room_id, mode, players, win_points, seed, serve_ticks,
+            tick_rate, started_at}
+  records  '<BH' tag, ticks since the previous record, then
+             INPUT_LEFT / INPUT_RIGHT        h   y in half pixels
+             INPUT_LEFT_F / INPUT_RIGHT_F    d   y that is not on a half pixel
+             POINT_LEFT / POINT_RIGHT            side that scored
+             END                             B   winner: 0 none, 1 left, 2 right
+             SKIP                                gap longer than 65535 ticks
+
+An input is 5 bytes and paddle targets are coalesced to one per side per
+tick, so a two-minute match with both mice moving all the time is under
+75 KB and a typical one a few KB. The tick path only appends to an
+in-memory buffer. RecordingStore.flush() writes the buffers out, and the
+server calls it from a background task.
+
+    store = RecordingStore('recordings', max_files=1000)
+    store.start(room_id, room, serve_ticks=60, tick_rate=60)
+    store.inputs(room_id, room.tick + 1, room.pending_input)  # before each step
+    store.point(room_id, room.tick, 'left')
+    store.finish(room_id, room.tick, 'left')
+    store.flush()
+    header, records = store.load(match_id)
+    for room, scoring_side, winner_side in replay(header, records): ...
+"""
+import json
+import os
+import re
+import struct
+import time
+import uuid
+
+from pong_sim import step
+from pong_state import new_room_state
+
+MAGIC = b'PREC'
+VERSION = 1
+EXTENSION = '.pongrec'
+
+HEADER = struct.Struct('<4sBH')
+RECORD = struct.Struct('<BH')
+INPUT_HALF = struct.Struct('<BHh')
+INPUT_EXACT = struct.Struct('<BHd')
+END_RECORD = struct.Struct('<BHB')
+
+INPUT_LEFT, INPUT_RIGHT, INPUT_LEFT_F, INPUT_RIGHT_F, POINT_LEFT, POINT_RIGHT, END, SKIP = range(1, 9)
+MAX_DELTA = 0xFFFF
+WINNERS = (None, 'left', 'right')
+
+_MATCH_ID = re.compile(r'^[0-9A-Za-z-]{1,64}$')
+
+
+class RecordingError(ValueError):
+    """A recording file that is not in this format"""
+
+
+class MatchRecorder:
+    """Buffered log of one match; appends never touch the disk"""
+    __slots__ = ('match_id', 'path', 'buffer', 'tick', 'finished')
+
+    def __init__(self, match_id, path, header):
+        data = json.dumps(header, separators=(',', ':')).encode()
+        self.match_id = match_id
+        self.path = path
+        self.buffer = bytearray(HEADER.pack(MAGIC, VERSION, len(data)))
+        self.buffer += data
+        self.tick = 0  # tick of the last record
+        self.finished = False
+
+    def _delta(self, tick):
+        """Ticks since the previous record, emitting SKIP records for long gaps"""
+        delta = tick - self.tick
+        if delta <= 0:
+            return 0
+        while delta > MAX_DELTA:
+            self.buffer += RECORD.pack(SKIP, MAX_DELTA)
+            delta -= MAX_DELTA
+        self.tick = tick
+        return delta
+
+    def input(self, tick, side, y):
+        half = y * 2
+        if half == int(half) and -0x8000 <= half < 0x8000:
+            tag = INPUT_LEFT if side == 'left' else INPUT_RIGHT
+            self.buffer += INPUT_HALF.pack(tag, self._delta(tick), int(half))
+        else:
+            tag = INPUT_LEFT_F if side == 'left' else INPUT_RIGHT_F
+            self.buffer += INPUT_EXACT.pack(tag, self._delta(tick), y)
+
+    def point(self, tick, side):
+        self.buffer += RECORD.pack(POINT_LEFT if side == 'left' else POINT_RIGHT, self._delta(tick))
+
+    def end(self, tick, winner):
+        tick = self.tick if tick is None else tick
+        self.buffer += END_RECORD.pack(END, self._delta(tick), WINNERS.index(winner))
+        self.finished = True
+
+
+class RecordingStore:
+    """Recordings of the matches running in this process, one file per match
+
+    At most max_files recordings are kept; finishing a match deletes the
+    oldest ones beyond that (None keeps everything).
+    """
+
+    def __init__(self, directory, max_files=None):
+        self.directory = directory
+        self.max_files = max_files
+        self.active = {}  # room_id -> MatchRecorder of its running match
+        self.closing = []  # finished recorders with bytes not yet written
+
+    @property
+    def pending(self):
+        """True while some recording still has to be flushed"""
+        return bool(self.active or self.closing)
+
+    def start(self, room_id, room, serve_ticks, tick_rate):
+        """Begin recording the match the room just reset for; returns its match id"""
+        self.finish(room_id)
+        match_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:8]
+        header = {
+            'match_id': match_id,
+            'room_id': room_id,
+            'mode': room.mode,
+            'players': dict(room.players),
+            'win_points': room.win_points,
+            'seed': room.seed,
+            'serve_ticks': serve_ticks,
+            'tick_rate': tick_rate,
+            'started_at': int(time.time())
+        }
+        self.active[room_id] = MatchRecorder(match_id, self.path(match_id), header)
+        return match_id
+
+    def inputs(self, room_id, tick, pending):
+        """Record the paddle targets applied on tick (room.pending_input before the step)"""
+        recorder = self.active.get(room_id)
+        if recorder is None:
+            return
+        for side in ('left', 'right'):
+            y = pending[side]
+            if y is not None:
+                recorder.input(tick, side, y)
+
+    def point(self, room_id, tick, side):
+        recorder = self.active.get(room_id)
+        if recorder is not None:
+            recorder.point(tick, side)
+
+    def finish(self, room_id, tick=None, winner=None):
+        """End the room's recording; winner None marks a match that was abandoned"""
+        recorder = self.active.pop(room_id, None)
+        if recorder is not None:
+            recorder.end(tick, winner)
+            self.closing.append(recorder)
+            self.prune()
+
+    def prune(self):
+        """Delete the oldest recordings beyond max_files; returns how many were deleted"""
+        if self.max_files is None or not os.path.isdir(self.directory):
+            return 0
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(EXTENSION))
+        excess = len(names) - self.max_files
+        if excess <= 0:
+            return 0
+        in_use = {recorder.path for recorder in list(self.active.values()) + self.closing}
+        deleted = 0
+        for name in names:  # match ids start with their start time, so oldest first
+            if deleted == excess:
+                break
+            path = os.path.join(self.directory, name)
+            if path in in_use:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            deleted += 1
+        return deleted
+
+    def flush(self):
+        """Append every buffered record to its file; returns the bytes written"""
+        written = 0
+        recorders = list(self.active.values()) + self.closing
+        self.closing = []
+        if recorders:
+            os.makedirs(self.directory, exist_ok=True)
+        for recorder in recorders:
+            if recorder.buffer:
+                with open(recorder.path, 'ab') as f:
+                    f.write(recorder.buffer)
+                written += len(recorder.buffer)
+                recorder.buffer.clear()
+        return written
+
+    def path(self, match_id):
+        if not _MATCH_ID.match(match_id or ''):
+            raise RecordingError(f"invalid match id {match_id!r}")
+        return os.path.join(self.directory, match_id + EXTENSION)
+
+    def exists(self, match_id):
+        return _MATCH_ID.match(match_id or '') is not None and os.path.isfile(self.path(match_id))
+
+    def read(self, match_id):
+        with open(self.path(match_id), 'rb') as f:
+            return f.read()
+
+    def load(self, match_id):
+        """(header, records) of a recording; see parse()"""
+        return parse(self.read(match_id))
+
+    def headers(self, limit=50):
+        """Headers of the newest recordings (plus their size in bytes), newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((n for n in os.listdir(self.directory) if n.endswith(EXTENSION)), reverse=True)
+        headers = []
+        for name in names[:limit]:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as f:
+                    header = _read_header(f.read(HEADER.size), f)
+            except (OSError, RecordingError):
+                continue
+            header['bytes'] = os.path.getsize(path)
+            headers.append(header)
+        return headers
+
+
+def _read_header(prefix, f):
+    if len(prefix) != HEADER.size:
+        raise RecordingError("truncated header")
+    magic, version, length = HEADER.unpack(prefix)
+    if magic != MAGIC or version != VERSION:
+        raise RecordingError(f"not a version {VERSION} recording")
+    data = f.read(length)
+    if len(data) != length:
+        raise RecordingError("truncated header")
+    return json.loads(data)
+
+
+def parse(data):
+    """Decode a recording into (header, records)
+
+    records is a list of (tick, kind, value): ('input', (side, y)),
+    ('point', side) or ('end', winner side or None). A recording cut short
+    (server stopped mid-match) just has no 'end' record.
+    """
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise RecordingError("truncated header")
+    magic, version, length = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise RecordingError(f"not a version {VERSION} recording")
+    offset = HEADER.size + length
+    header = json.loads(bytes(view[HEADER.size:offset]))
+    records = []
+    tick = 0
+    while offset + RECORD.size <= len(view):
+        tag, delta = RECORD.unpack_from(view, offset)
+        if tag in (INPUT_LEFT, INPUT_RIGHT):
+            fmt, side = INPUT_HALF, 'left' if tag == INPUT_LEFT else 'right'
+        elif tag in (INPUT_LEFT_F, INPUT_RIGHT_F):
+            fmt, side = INPUT_EXACT, 'left' if tag == INPUT_LEFT_F else 'right'
+        elif tag == END:
+            fmt = END_RECORD
+        elif tag in (POINT_LEFT, POINT_RIGHT, SKIP):
+            fmt = RECORD
+        else:
+            raise RecordingError(f"unknown record tag {tag} at byte {offset}")
+        if offset + fmt.size > len(view):
+            break  # partially written last record
+        fields = fmt.unpack_from(view, offset)
+        offset += fmt.size
+        tick += delta
+        if fmt is INPUT_HALF:
+            records.append((tick, 'input', (side, fields[2] / 2)))
+        elif fmt is INPUT_EXACT:
+            records.append((tick, 'input', (side, fields[2])))
+        elif tag == END:
+            records.append((tick, 'end', WINNERS[fields[2]] if fields[2] < len(WINNERS) else None))
+        elif tag != SKIP:
+            records.append((tick, 'point', 'left' if tag == POINT_LEFT else 'right'))
+    return header, records
+
+
+def replay(header, records):
+    """Re-simulate a recorded match; yields (room, scoring_side, winner_side) after every tick"""
+    room = new_room_state(header['mode'], header['win_points'], seed=header['seed'])
+    room.players = dict(header['players'])
+    room.game_running = True
+    serve_ticks = header['serve_ticks']
+    inputs = [(tick, value) for tick, kind, value in records if kind == 'input']
+    ends = [tick for tick, kind, _ in records if kind == 'end']
+    last_tick = ends[0] if ends else (records[-1][0] if records else 0)
+    i = 0
+    while room.tick < last_tick:
+        tick = room.tick + 1
+        while i < len(inputs) and inputs[i][0] <= tick:
+            side, y = inputs[i][1]
+            room.pending_input[side] = y
+            i += 1
+        scoring_side, winner_side = step(room, serve_ticks)
+        yield room, scoring_side, winner_side
+        if winner_side:
+            break
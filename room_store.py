@@ -0,0 +1,317 @@
+"""
+Room-state stores for live Pong rooms
+
+run.py keeps every live room in a RoomStore (active_rooms). The store maps
+room ids to RoomState objects and offers get/put/remove, iteration, and
+subscribe() for callbacks on every put and remove. Plain dict access
+(active_rooms[room_id], .get, .items, del, pop) works too.
+
+DictRoomStore is the in-process dict. SharedMemoryRoomStore also copies every
+room into a fixed-size record of an mmap'd file, so other processes (lobby
+listings, metrics, a sidecar) can read live rooms and scores with
+SharedRoomReader without asking the game workers:
+
+  put/remove       rewrite or free the room's whole record
+  write_tick       called by the game loop every tick; packs ball, paddles and
+                   score straight into the mapped record (no buffers allocated)
+
+File layout (little-endian): a HEADER of magic, layout version, record size,
+capacity and a generation counter bumped on every put/remove, followed by
+capacity records of META then TICK. TICK starts and ends with the tick
+number so a reader can tell a half-written record and read it again.
+
+Configured from the environment:
+
+  PONG_ROOM_STORE           'dict' (default) or 'shm'
+  PONG_ROOM_STORE_PATH      record file (default /dev/shm/pong-rooms[-<shard>].bin)
+  PONG_ROOM_STORE_CAPACITY  number of records (default 4096)
+
+    python room_store.py /dev/shm/pong-rooms.bin [--watch]   # print live rooms as JSON
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+
+from pong_logging import get_logger
+from pong_state import PHASE_PLAYING, PHASE_SERVING
+
+log = get_logger('server')
+
+MAGIC = b'PONG'
+LAYOUT_VERSION = 1
+DEFAULT_CAPACITY = 4096
+
+HEADER = struct.Struct('<4sHHII')  # magic, layout version, record size, capacity, generation
+GENERATION_OFFSET = 12
+META = struct.Struct('<B64sBBBI')  # used, room id, mode, game_running, members, win_points
+TICK = struct.Struct('<Q6fIIBQ')  # tick, ball x/y/dx/dy, left y, right y, left/right score, serving, tick
+TICK_OFFSET = 72  # META.size
+RECORD_SIZE = 128  # TICK_OFFSET + TICK.size padded to 8 bytes
+
+MODES = ('pvp', 'bot')
+
+
+class RoomStore:
+    """Live room states by room id, with dict-style access on top of get/put/remove"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def get(self, room_id, default=None):
+        raise NotImplementedError
+
+    def put(self, room_id, state):
+        raise NotImplementedError
+
+    def remove(self, room_id):
+        """Drop a room; returns its state or None"""
+        raise NotImplementedError
+
+    def items(self):
+        raise NotImplementedError
+
+    def write_tick(self, room_id, state, tick):
+        """Publish the room's per-tick fields (ball, paddles, score); no-op unless shared"""
+
+    def subscribe(self, callback):
+        """Call callback(event, room_id, state) on every 'put' and 'remove'"""
+        self.subscribers.append(callback)
+
+    def _notify(self, event, room_id, state):
+        for callback in self.subscribers:
+            callback(event, room_id, state)
+
+    def keys(self):
+        return [room_id for room_id, _ in self.items()]
+
+    def values(self):
+        return [state for _, state in self.items()]
+
+    def pop(self, room_id, default=None):
+        state = self.remove(room_id)
+        return default if state is None else state
+
+    def __getitem__(self, room_id):
+        state = self.get(room_id)
+        if state is None:
+            raise KeyError(room_id)
+        return state
+
+    def __setitem__(self, room_id, state):
+        self.put(room_id, state)
+
+    def __delitem__(self, room_id):
+        if self.remove(room_id) is None:
+            raise KeyError(room_id)
+
+    def __contains__(self, room_id):
+        return self.get(room_id) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+class DictRoomStore(RoomStore):
+    """Rooms in a plain in-process dict"""
+
+    def __init__(self):
+        super().__init__()
+        self.rooms = {}
+
+    def get(self, room_id, default=None):
+        return self.rooms.get(room_id, default)
+
+    def put(self, room_id, state):
+        self.rooms[room_id] = state
+        self._notify('put', room_id, state)
+
+    def remove(self, room_id):
+        state = self.rooms.pop(room_id, None)
+        if state is not None:
+            self._notify('remove', room_id, state)
+        return state
+
+    def items(self):
+        return list(self.rooms.items())
+
+    def __len__(self):
+        return len(self.rooms)
+
+
+class SharedMemoryRoomStore(DictRoomStore):
+    """DictRoomStore that mirrors every room into a fixed-size record of an mmap'd file
+
+    The RoomState objects stay in this process (sockets, encoders and AI state
+    cannot be shared); the records carry what other processes need to see.
+    A room that does not fit in capacity is kept, just not published.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        super().__init__()
+        self.path = path
+        self.capacity = capacity
+        self.generation = 0
+        self.slots = {}  # room_id -> record offset
+        self.tick_offsets = {}  # room_id -> offset of the record's TICK part
+        self.free = list(range(capacity - 1, -1, -1))  # free slot indexes, lowest last
+        # A fresh file each start: readers still mapping the old one notice the new inode
+        if os.path.exists(path):
+            os.unlink(path)
+        size = HEADER.size + capacity * RECORD_SIZE
+        with open(path, 'w+b') as f:
+            f.truncate(size)
+            self.mm = mmap.mmap(f.fileno(), size)
+        HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT_VERSION, RECORD_SIZE, capacity, 0)
+
+    def put(self, room_id, state):
+        offset = self.slots.get(room_id)
+        tick = 0
+        if offset is not None:
+            tick = TICK.unpack_from(self.mm, offset + TICK_OFFSET)[0]  # keep the last tick written
+        elif not self.free:
+            log.limited(logging.WARNING, "room_store_full", capacity=self.capacity, room=room_id)
+        else:
+            offset = HEADER.size + self.free.pop() * RECORD_SIZE
+            self.slots[room_id] = offset
+            self.tick_offsets[room_id] = offset + TICK_OFFSET
+        if offset is not None:
+            META.pack_into(self.mm, offset, 1, room_id.encode()[:64],
+                           MODES.index(state.mode) if state.mode in MODES else 0,
+                           state.game_running, min(len(state.members), 255), state.win_points)
+            self._write_tick(self.tick_offsets[room_id], state, tick)
+            self._bump_generation()
+        super().put(room_id, state)
+
+    def remove(self, room_id):
+        offset = self.slots.pop(room_id, None)
+        if offset is not None:
+            del self.tick_offsets[room_id]
+            self.mm[offset] = 0  # record unused
+            self.free.append((offset - HEADER.size) // RECORD_SIZE)
+            self._bump_generation()
+        return super().remove(room_id)
+
+    def write_tick(self, room_id, state, tick):
+        offset = self.tick_offsets.get(room_id)
+        if offset is not None:
+            self._write_tick(offset, state, tick)
+
+    def _write_tick(self, offset, state, tick):
+        game_state = state.game_state
+        ball = game_state.ball
+        score = game_state.score
+        TICK.pack_into(self.mm, offset, tick, ball.x, ball.y, ball.dx, ball.dy,
+                       game_state.left.y, game_state.right.y, score.left, score.right,
+                       state.phase == PHASE_SERVING, tick)
+
+    def _bump_generation(self):
+        self.generation = (self.generation + 1) & 0xFFFFFFFF
+        struct.pack_into('<I', self.mm, GENERATION_OFFSET, self.generation)
+
+    def close(self):
+        self.mm.close()
+
+
+class SharedRoomReader:
+    """Read-only view of a SharedMemoryRoomStore file from any process"""
+
+    def __init__(self, path):
+        self.path = path
+        self.mm = None
+        self.inode = None
+
+    def _mapping(self):
+        """Map the file, again if the writer restarted and replaced it"""
+        inode = os.stat(self.path).st_ino
+        if self.mm is None or inode != self.inode:
+            if self.mm is not None:
+                self.mm.close()
+            with open(self.path, 'rb') as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = inode
+            magic, version, record_size, _, _ = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or version != LAYOUT_VERSION or record_size != RECORD_SIZE:
+                raise ValueError(f"{self.path} is not a Pong room store (layout {version})")
+        return self.mm
+
+    @property
+    def generation(self):
+        """Changes whenever a room is put or removed; poll it to watch for changes"""
+        return HEADER.unpack_from(self._mapping(), 0)[4]
+
+    def items(self):
+        """(room_id, room dict) for every room in the store"""
+        mm = self._mapping()
+        capacity = HEADER.unpack_from(mm, 0)[3]
+        rooms = []
+        for slot in range(capacity):
+            offset = HEADER.size + slot * RECORD_SIZE
+            if mm[offset]:
+                room = self._read(mm, offset)
+                if room is not None:
+                    rooms.append((room['id'], room))
+        return rooms
+
+    def get(self, room_id):
+        for rid, room in self.items():
+            if rid == room_id:
+                return room
+        return None
+
+    def _read(self, mm, offset):
+        for _ in range(3):  # retry records caught mid-write
+            used, raw_id, mode, running, members, win_points = META.unpack_from(mm, offset)
+            tick, bx, by, dx, dy, left_y, right_y, left, right, serving, tick_end = TICK.unpack_from(mm, offset + TICK_OFFSET)
+            if tick == tick_end:
+                break
+        else:
+            return None  # still being written; the next read will see it
+        if not used:
+            return None
+        return {
+            'id': raw_id.rstrip(b'\0').decode(),
+            'mode': MODES[mode] if mode < len(MODES) else 'pvp',
+            'game_running': bool(running),
+            'phase': PHASE_SERVING if serving else PHASE_PLAYING,
+            'members': members,
+            'win_points': win_points,
+            'tick': tick,
+            'ball': {'x': bx, 'y': by, 'dx': dx, 'dy': dy},
+            'paddles': {'left': {'y': left_y}, 'right': {'y': right_y}},
+            'score': {'left': left, 'right': right}
+        }
+
+
+def default_store_path(shard_id=None):
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp'
+    name = 'pong-rooms.bin' if shard_id is None else f'pong-rooms-{shard_id}.bin'
+    return os.path.join(base, name)
+
+
+def store_from_env(shard_id=None, environ=os.environ):
+    """Room store selected by PONG_ROOM_STORE"""
+    kind = environ.get('PONG_ROOM_STORE', 'dict').lower()
+    if kind == 'shm':
+        path = environ.get('PONG_ROOM_STORE_PATH') or default_store_path(shard_id)
+        capacity = int(environ.get('PONG_ROOM_STORE_CAPACITY', DEFAULT_CAPACITY))
+        log.info("room_store", kind='shm', path=path, capacity=capacity)
+        return SharedMemoryRoomStore(path, capacity)
+    if kind != 'dict':
+        log.warning("room_store", kind='dict', reason=f"unknown PONG_ROOM_STORE {kind!r}")
+    return DictRoomStore()
+
+
+if __name__ == "__main__":
+    # Minimal sidecar: dump the live rooms of a running server
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    reader = SharedRoomReader(paths[0] if paths else default_store_path())
+    watch = '--watch' in sys.argv
+    while True:
+        print(json.dumps([room for _, room in reader.items()], indent=2))
+        if not watch:
+            break
+        time.sleep(1)
@@ -2,18 +2,38 @@
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, render_template, request, redirect, session, url_for, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, session, url_for, flash, jsonify, send_from_directory, stream_with_context
 from flask_socketio import SocketIO, join_room, leave_room, emit
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
-from datetime import datetime, timedelta
-import threading
+import base64
+import json
+from datetime import datetime, timezone
 import time
-import random
-import math
 import os
 
+import logging
+
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, instrument_socketio
+from lobby import SORTS, EmptyRoomQueue, LobbyDiff, RoomDirectory, RoomEntry
+from pong_logging import configure_logging, get_logger, transport_logger
+from profiler import SamplingProfiler
+from recording import RecordingError, RecordingStore, parse as parse_recording, replay
+from pong_sim import apply_inputs, step as sim_step
+from pong_state import PHASE_PLAYING, MembershipIndex, new_room_state
+from pong_wire import WIRE_BINARY, WIRE_JSON, WIRE_VERSION, SnapshotEncoder, decode_paddle_move, encode_frame
+from room_store import store_from_env
+from sharding import bus_from_env, config_from_env
+
+# Per-subsystem structured logs (see pong_logging.py); levels come from PONG_LOG_*
+configure_logging()
+log_transport = get_logger('transport')
+log_lobby = get_logger('lobby')
+log_join = get_logger('join')
+log_sim = get_logger('simulation')
+log_server = get_logger('server')
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret!'
 
@@ -33,10 +53,41 @@ socketio = SocketIO(
     async_mode='eventlet', 
     manage_session=False, 
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True
+    logger=transport_logger('socketio'),  # per-packet logs only at PONG_LOG_TRANSPORT=INFO
+    engineio_logger=transport_logger('engineio')
 )
 
+# Prometheus metrics served at /metrics (see metrics.py); room and socket
+# counts are read at scrape time, everything else is counted as it happens
+metrics = MetricsRegistry()
+metrics.gauge('pong_rooms_active', 'Rooms with live state in this process', ('mode',),
+              callback=lambda: _count_by_mode(active_rooms.items()))
+metrics.gauge('pong_rooms_running', 'Rooms whose game the scheduler is stepping', ('mode',),
+              callback=lambda: _count_by_mode((rid, active_rooms.get(rid)) for rid in scheduler.running_rooms))
+metrics.gauge('pong_connected_sockets', 'Connected Engine.IO clients',
+              callback=lambda: len(socketio.server.eio.sockets))
+metrics.gauge('pong_spectators', 'Sockets watching a room as spectators',
+              callback=lambda: len(spectating))
+tick_seconds = metrics.histogram('pong_tick_duration_seconds', 'Time spent in one simulation tick (budget 1/60 s)')
+ticks_total = metrics.counter('pong_ticks_total', 'Simulation ticks run')
+ticks_behind = metrics.gauge('pong_ticks_behind', 'Ticks the scheduler is behind its 60 Hz schedule')
+ticks_skipped = metrics.counter('pong_ticks_skipped_total', 'Ticks dropped after falling too far behind')
+emitted_events = metrics.counter('pong_emitted_events_total', 'Socket.IO events sent, per recipient', ('event',))
+emitted_bytes = metrics.counter('pong_emitted_bytes_total', 'Encoded Socket.IO event bytes sent', ('event',))
+paddle_moves = metrics.counter('pong_paddle_moves_total', 'pong_paddle_move events received')
+db_seconds = metrics.histogram('pong_db_query_seconds', 'Database time per request path', ('path',))
+db_join_seconds = db_seconds.labels('join')
+db_dashboard_seconds = db_seconds.labels('dashboard')
+instrument_socketio(socketio.server, emitted_events, emitted_bytes)
+
+
+def _count_by_mode(rooms):
+    counts = {'pvp': 0, 'bot': 0}
+    for _, state in rooms:
+        if state is not None:
+            counts[state.mode] = counts.get(state.mode, 0) + 1
+    return counts
+
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -57,28 +108,141 @@ class Room(db.Model):
     password = db.Column(db.String(255), nullable=True)  # store hashed or plain for demo
     mode = db.Column(db.String(20), nullable=False, default='pvp')  # pvp / bot
     win_points = db.Column(db.Integer, nullable=False, default=5)  # points needed to win
+    broadcast_hz = db.Column(db.Integer, nullable=True, default=20)  # pong_update rate (10/20/30)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
 
 
-# In-memory active room state for Pong
-active_rooms = {}
-# active_rooms[room_id] = {
-#   'members': set([username,...]),
-#   'mode': 'pvp' or 'bot',
-#   'players': {'left': username, 'right': username}, # in bot mode: left='Computer', right=username
-#   'game_state': {
-#     'ball': {'x': 400, 'y': 300, 'dx': 5, 'dy': 3},
-#     'paddles': {'left': {'y': 250}, 'right': {'y': 250}},
-#     'score': {'left': 0, 'right': 0}
-#   },
-#   'game_running': False,
-#   'winner': None,
-#   'rematch_votes': set(['left','right']),
-#   'rematch_requested': False,
-#   'rematch_pending': set(),
-#   'room_creator': username
-# }
+# Sharded mode (PONG_SHARDS, see sharding.py): this process only simulates the
+# rooms it owns; lobby changes are shared with the other shards over shard_bus
+shards = config_from_env()
+shard_bus = bus_from_env(shards)
+
+# In-memory active room state for Pong; PONG_ROOM_STORE=shm also publishes it
+# to other processes through a shared-memory file (see room_store.py)
+active_rooms = store_from_env(shards.shard_id if shards else None)
+# active_rooms[room_id] = RoomState (see pong_state.py), built with new_room_state():
+#   members: set of usernames, mode: 'pvp' or 'bot', win_points, room_creator,
+#   players: {'left': username, 'right': username}  # in bot mode: left='Computer', right=username
+#   game_state: GameState(ball, left, right, score), game_running, winner,
+#   phase: 'playing' or 'serving' (after a point, until serve_tick)
+
+# sid -> (username, room_id, side) and username -> room_ids, so leave and
+# disconnect only touch the rooms a socket joined (and a second tab survives)
+memberships = MembershipIndex()
+
+# sid -> room_id of read-only spectators; kept apart from memberships since
+# spectators are never members and never hold a paddle
+spectating = {}
+
+
+def _owns_room(room_id):
+    return shards is None or shards.owns(room_id)
+
+# Lobby listing rendered by /dashboard (see lobby.py)
+room_directory = RoomDirectory()
+
+
+def _room_directory():
+    """Room directory, loaded with one joined query on first use"""
+    if not room_directory.loaded:
+        with db_dashboard_seconds.time():
+            rows = (db.session.query(Room, User.username)
+                    .outerjoin(User, Room.created_by == User.id)
+                    .order_by(Room.created_at)
+                    .all())
+        room_directory.load(rows, {rid: len(state.members) for rid, state in active_rooms.items()})
+        # Rooms nobody is connected to count as empty since they were created
+        for entry in room_directory:
+            if _owns_room(entry.id) and not _room_connected(entry.id):
+                since = entry.created_at.replace(tzinfo=timezone.utc).timestamp() if entry.created_at else time.time()
+                reaper.mark_empty(entry.id, since)
+    return room_directory
+
+
+def _room_connected(room_id):
+    """True while any member of the room has a socket in it"""
+    state = active_rooms.get(room_id)
+    return bool(state) and any(memberships.in_room(username, room_id) for username in state.members)
+
+
+# Lobby notifications; each keeps room_directory in step with what dashboards see.
+# Changes are batched into one lobby_diff sent to the lobby room every
+# LOBBY_FLUSH_INTERVAL, so in-game sockets never receive lobby chatter.
+LOBBY_ROOM = 'lobby'
+LOBBY_FLUSH_INTERVAL = 0.25
+lobby_diff = LobbyDiff()
+_lobby_flush_task = None
+
+
+def _announce_room_created(entry):
+    _announce({
+        'event': 'room_created',
+        'room': entry.to_dict(),
+        'created_at': entry.created_at.isoformat() if entry.created_at else None
+    })
+
+
+def _announce_room_updated(room_id, players):
+    _announce({'event': 'room_updated', 'room_id': room_id, 'players': players})
+
+
+def _announce_room_dissolved(room_id):
+    _announce({'event': 'room_dissolved', 'room_id': room_id})
+
+
+def _announce_game_started(room_id):
+    _announce({'event': 'game_started', 'room_id': room_id})
+
+
+def _announce(event):
+    """Apply a lobby change here and share it with the other shards"""
+    _apply_lobby_event(event)
+    shard_bus.publish('lobby', event)
+
+
+def _apply_lobby_event(event):
+    """Update room_directory and the pending lobby_diff (local or from another shard)"""
+    kind = event['event']
+    if kind == 'room_created':
+        room = event['room']
+        created_at = datetime.fromisoformat(event['created_at']) if event.get('created_at') else None
+        room_directory.add(RoomEntry(room['id'], room['name'], room['type'], room['mode'],
+                                     room['win_points'], room['created_by'], room['players'], created_at))
+        lobby_diff.room_created(dict(room))
+        if _owns_room(room['id']) and not _room_connected(room['id']):
+            # Created through another shard's HTTP handler: expire it here if nobody ever joins
+            reaper.mark_empty(room['id'])
+    elif kind == 'room_updated':
+        room_directory.set_players(event['room_id'], event['players'])
+        lobby_diff.room_updated(event['room_id'], event['players'])
+    elif kind == 'room_dissolved':
+        room_directory.remove(event['room_id'])
+        lobby_diff.room_dissolved(event['room_id'])
+    elif kind == 'game_started':
+        lobby_diff.game_started(event['room_id'])
+    _schedule_lobby_flush()
+
+
+def _schedule_lobby_flush():
+    global _lobby_flush_task
+    if _lobby_flush_task is None:
+        _lobby_flush_task = socketio.start_background_task(_flush_lobby)
+
+
+def _flush_lobby():
+    """Send pending lobby changes every LOBBY_FLUSH_INTERVAL until there are none"""
+    global _lobby_flush_task
+    try:
+        while True:
+            socketio.sleep(LOBBY_FLUSH_INTERVAL)
+            payload = lobby_diff.take()
+            if payload is None:
+                break
+            payload['version'] = room_directory.version
+            socketio.emit('lobby_diff', payload, to=LOBBY_ROOM)
+    finally:
+        _lobby_flush_task = None
 
 
 def init_database():
@@ -94,18 +258,30 @@ def init_database():
                 db.session.execute(db.text('SELECT win_points FROM room LIMIT 1'))
             except Exception:
                 # Column doesn't exist, add it
-                print("Adding missing win_points column to room table...")
+                log_server.info("db_add_column", column="win_points")
                 try:
                     db.session.execute(db.text('ALTER TABLE room ADD COLUMN win_points INTEGER DEFAULT 5'))
                     db.session.commit()
-                    print("Successfully added win_points column")
                 except Exception as e:
-                    print(f"Error adding win_points column: {e}")
+                    log_server.error("db_add_column_failed", column="win_points", error=e)
                     db.session.rollback()
             
-            print("Database initialized successfully")
+            # Same for the per-room broadcast rate
+            try:
+                db.session.execute(db.text('SELECT broadcast_hz FROM room LIMIT 1'))
+            except Exception:
+                db.session.rollback()
+                log_server.info("db_add_column", column="broadcast_hz")
+                try:
+                    db.session.execute(db.text('ALTER TABLE room ADD COLUMN broadcast_hz INTEGER DEFAULT 20'))
+                    db.session.commit()
+                except Exception as e:
+                    log_server.error("db_add_column_failed", column="broadcast_hz", error=e)
+                    db.session.rollback()
+            
+            log_server.info("db_initialized")
         except Exception as e:
-            print(f"Database initialization failed: {e}")
+            log_server.error("db_init_failed", error=e)
             # For Vercel, this might be expected due to read-only filesystem
             # The app will still work with in-memory data
             pass
@@ -186,6 +362,7 @@ def dashboard():
         room_type = request.form["room_type"]
         mode = request.form.get("room_mode", "pvp")
         win_points = int(request.form.get("win_points", 5)) if request.form.get("win_points") else 5
+        broadcast_hz = _broadcast_rate(request.form.get("broadcast_hz"))
         password = request.form.get("password") if room_type == "private" else None
         room_id = str(uuid.uuid4())
 
@@ -196,18 +373,20 @@ def dashboard():
             password=password,
             mode=mode,
             win_points=win_points,
+            broadcast_hz=broadcast_hz,
             created_by=session.get("user_id"),
             created_at=datetime.utcnow()
         )
         
         # Try to add win_points if column doesn't exist
+        db_started = time.perf_counter()
         try:
             db.session.add(new_room)
             db.session.commit()
         except Exception as e:
             # If win_points column doesn't exist, try to add it and retry
             if "win_points" in str(e):
-                print("win_points column missing, attempting to add it...")
+                log_server.warning("db_add_column", column="win_points", room=room_id)
                 try:
                     db.session.rollback()
                     db.session.execute(db.text('ALTER TABLE room ADD COLUMN win_points INTEGER DEFAULT 5'))
@@ -215,9 +394,8 @@ def dashboard():
                     # Now try to add the room again
                     db.session.add(new_room)
                     db.session.commit()
-                    print("Successfully added room after adding win_points column")
                 except Exception as e2:
-                    print(f"Failed to add win_points column: {e2}")
+                    log_server.error("db_add_column_failed", column="win_points", error=e2)
                     db.session.rollback()
                     # Fallback: create room without win_points
                     new_room = Room(
@@ -233,96 +411,293 @@ def dashboard():
                     db.session.commit()
             else:
                 raise e
+        db_dashboard_seconds.observe(time.perf_counter() - db_started)
 
-        # initialize in-memory state for Pong
-        active_rooms[room_id] = {
-            'members': {session["username"]},  # Creator is automatically a member
-            'mode': mode,
-            'win_points': win_points,
-            'players': {'left': None, 'right': None},
-            'game_state': {
-                'ball': {'x': 400, 'y': 300, 'dx': 4, 'dy': 2},  # Use consistent starting values
-                'paddles': {'left': {'y': 250}, 'right': {'y': 250}},
-                'score': {'left': 0, 'right': 0}
-            },
-            'game_running': False,
-            'winner': None,
-            'room_creator': session["username"]
-        }
+        # initialize in-memory state for Pong (on the shard that will run the room)
+        if _owns_room(room_id):
+            active_rooms[room_id] = new_room_state(
+                mode,
+                win_points,
+                room_creator=session["username"],
+                members={session["username"]},  # Creator is automatically a member
+                broadcast_hz=broadcast_hz
+            )
+            reaper.mark_empty(room_id)  # until the creator's game page connects
         
         # Emit realtime room update to all connected users
-        socketio.emit('room_created', {
-            'room': {
-                'id': room_id,
-                'name': room_name,
-                'type': room_type,
-                'mode': mode,
-                'players': 1,  # Creator is already a member
-                'win_points': win_points,
-                'created_by': session["username"]
-            }
-        })
+        _announce_room_created(RoomEntry(
+            room_id, room_name, room_type, mode, win_points, session["username"],
+            players=1,  # Creator is already a member
+            created_at=new_room.created_at
+        ))
         
+        if not _owns_room(room_id):
+            return redirect(shards.room_url(room_id, url_for("game", room_id=room_id)))
         return redirect(url_for("game", room_id=room_id))
     
-    # list rooms with simple counts from in-memory when available
+    # The room list is paged in by the browser from /api/rooms
+    return render_template("dashboard.html")
+
+ROOMS_PAGE_SIZE = 20
+ROOMS_PAGE_MAX = 100
+
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, sort):
+    """Sort key from an opaque cursor; raises ValueError if it was not made for this sort"""
     try:
-        # Cleanup: delete rooms with zero members older than 5 minutes
-        now_utc = datetime.utcnow()
-        to_delete_ids = []
-        for r in Room.query.all():
-            members = active_rooms.get(r.id, {}).get('members', set())
-            member_count = len(members)
-            created_at = r.created_at or now_utc
-            room_age = (now_utc - created_at)
-            if member_count == 0 and room_age > timedelta(minutes=5):
-                to_delete_ids.append(r.id)
-
-        if to_delete_ids:
-            for rid in to_delete_ids:
-                # Remove from memory
-                active_rooms.pop(rid, None)
-                # Remove from DB
-                stale_room = Room.query.filter_by(id=rid).first()
-                if stale_room:
-                    db.session.delete(stale_room)
-            db.session.commit()
-            # Notify dashboards to update
-            for rid in to_delete_ids:
-                socketio.emit('room_dissolved', {'room_id': rid})
-
-        # Build fresh list after cleanup
-        all_rooms = Room.query.all()
-        room_list = []
-        for r in all_rooms:
-            count = len(active_rooms.get(r.id, {}).get('members', set()))
-            creator_name = "Unknown"
-            if r.created_by:
-                creator = User.query.get(r.created_by)
-                if creator:
-                    creator_name = creator.username
-            # Get win_points from database
-            win_points = getattr(r, 'win_points', 5)  # Fallback to 5 if column doesn't exist
-            room_list.append({
-                'id': r.id,
-                'name': r.name,
-                'type': r.type,
-                'mode': r.mode,
-                'players': count,
-                'win_points': win_points,
-                'created_by': creator_name
-            })
-    except Exception as e:
-        print(f"Error loading rooms: {e}")
-        room_list = []
-    
-    return render_template("dashboard.html", rooms=room_list)
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("malformed cursor")
+    types = (int, float, str) if sort == 'players' else (float, str)
+    if not isinstance(key, list) or len(key) != len(types) or \
+            not all(isinstance(v, t) or (t is float and isinstance(v, int)) for v, t in zip(key, types)):
+        raise ValueError("cursor does not match sort")
+    return tuple(key)
+
+
+@app.route("/api/rooms")
+def api_rooms():
+    """Lobby room list: ?sort=created|players&order=desc|asc&mode=&type=&free=1&limit=&cursor="""
+    if "username" not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    directory = _room_directory()
+    # Same directory version -> same listing for this URL
+    etag = f"rooms-{directory.version}"
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    args = request.args
+    sort = args.get('sort', 'created')
+    if sort not in SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(SORTS)}"}), 400
+    mode = args.get('mode') or None
+    room_type = args.get('type') or None
+    free_slot = args.get('free', '').lower() in ('1', 'true', 'yes')
+    try:
+        limit = max(1, min(ROOMS_PAGE_MAX, int(args.get('limit', ROOMS_PAGE_SIZE))))
+        cursor = _decode_cursor(args['cursor'], sort) if args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rooms, next_key = directory.page(sort, args.get('order', 'desc') != 'asc', cursor, limit,
+                                     mode=mode, type=room_type, free_slot=free_slot)
+    response = jsonify({
+        'rooms': [entry.to_dict() for entry in rooms],
+        'next_cursor': _encode_cursor(next_key) if next_key else None,
+        'version': directory.version
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape target"""
+    return metrics.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+
+# On-demand sampling profiles of the server thread (see profiler.py), for the
+# usernames listed in PONG_ADMINS; files go to PONG_PROFILE_DIR
+ADMINS = {name.strip() for name in os.environ.get('PONG_ADMINS', '').split(',') if name.strip()}
+profiler = SamplingProfiler(os.environ.get('PONG_PROFILE_DIR', 'profiles'))
+
+
+def _admin_error():
+    """Error response unless the session user is an admin"""
+    if "username" not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    if session["username"] not in ADMINS:
+        return jsonify({'error': 'Admins only'}), 403
+    return None
+
+
+def _profile_labels():
+    """Profile categories: the simulation tick and each Socket.IO event handler"""
+    labels = {TickScheduler.tick.__code__: 'simulation'}
+    for event, handler in socketio.server.handlers.get('/', {}).items():
+        handler = getattr(handler, '__wrapped__', handler)
+        labels[handler.__code__] = f'socketio:{event}'
+    return labels
+
+
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """POST starts a profile (?seconds=&hz=&top=); GET reports status and saved files"""
+    error = _admin_error()
+    if error:
+        return error
+    if request.method == "POST":
+        try:
+            seconds = float(request.values.get('seconds', 10))
+            hz = int(request.values.get('hz', 100))
+            top = int(request.values.get('top', 25))
+        except ValueError:
+            return jsonify({'error': 'seconds, hz and top must be numbers'}), 400
+        try:
+            name = profiler.start(seconds, hz, top, _profile_labels())
+        except RuntimeError as e:
+            return jsonify({'error': str(e)}), 409
+        log_server.info("profile_started", name=name, seconds=seconds, hz=hz, user=session["username"])
+        return jsonify({'status': 'started', 'name': name}), 202
+    return jsonify({
+        'running': profiler.current,
+        'last': profiler.last,
+        'files': profiler.files()[:40]
+    })
+
+
+@app.route("/admin/profile/<path:filename>")
+def admin_profile_file(filename):
+    error = _admin_error()
+    if error:
+        return error
+    if filename not in profiler.files():
+        return jsonify({'error': 'No such profile'}), 404
+    return send_from_directory(os.path.abspath(profiler.directory), filename, mimetype='text/plain')
+
+
+# Match recordings (see recording.py): the seed and per-tick inputs of every
+# match, buffered in memory and appended to PONG_RECORDING_DIR once a second
+recordings = RecordingStore(os.environ.get('PONG_RECORDING_DIR', 'recordings'),
+                            max_files=int(os.environ.get('PONG_RECORDING_MAX', 1000)) or None)
+RECORDING_FLUSH_INTERVAL = 1.0
+REPLAY_MAX_SPEED = 16
+_recording_flush_task = None
+
+
+def _schedule_recording_flush():
+    global _recording_flush_task
+    if _recording_flush_task is None:
+        _recording_flush_task = socketio.start_background_task(_flush_recordings)
+
+
+def _flush_recordings():
+    """Write buffered recordings every RECORDING_FLUSH_INTERVAL until no match is recorded"""
+    global _recording_flush_task
+    try:
+        while True:
+            socketio.sleep(RECORDING_FLUSH_INTERVAL)
+            try:
+                recordings.flush()
+            except OSError as e:
+                log_sim.limited(logging.ERROR, "recording_flush_failed", interval=60, error=e)
+            if not recordings.pending:
+                break
+    finally:
+        _recording_flush_task = None
+
+
+def _load_recording(match_id):
+    """((data, header, records), None) if the session user may watch the match, else (None, error response)
+
+    The file is read and parsed once; data is its raw bytes.
+    """
+    if "username" not in session:
+        return None, (jsonify({'error': 'Not authenticated'}), 401)
+    if not recordings.exists(match_id):
+        return None, (jsonify({'error': 'No such recording'}), 404)
+    try:
+        data = recordings.read(match_id)
+        header, records = parse_recording(data)
+    except (OSError, RecordingError) as e:
+        log_server.warning("recording_unreadable", match=match_id, error=e)
+        return None, (jsonify({'error': 'Recording is unreadable'}), 500)
+    if session["username"] not in ADMINS and session["username"] not in header['players'].values():
+        return None, (jsonify({'error': 'Only the players can watch this match'}), 403)
+    return (data, header, records), None
+
+
+@app.route("/api/replays")
+def api_replays():
+    """The newest recorded matches the session user played in (every match for admins)"""
+    if "username" not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    username = session["username"]
+    matches = [h for h in recordings.headers(limit=200)
+               if username in ADMINS or username in h['players'].values()]
+    return jsonify({'matches': matches[:50]})
+
+
+@app.route("/api/replays/<match_id>")
+def api_replay_file(match_id):
+    """The raw recording, for re-simulating in the client"""
+    recording, error = _load_recording(match_id)
+    if error:
+        return error
+    data, _, _ = recording
+    return Response(data, mimetype='application/octet-stream')
+
+
+@app.route("/api/replays/<match_id>/stream")
+def api_replay_stream(match_id):
+    """Re-simulate a recorded match and stream it as newline-delimited JSON
+
+    ?speed=1 plays in real time, higher values fast-forward (up to
+    REPLAY_MAX_SPEED). The first line is the recording header, then
+    pong_update frames at the default broadcast rate and a pong_score line
+    per point. The last line has the final score and whether the replay
+    scored exactly the points that were recorded.
+    """
+    recording, error = _load_recording(match_id)
+    if error:
+        return error
+    _, header, records = recording
+    try:
+        speed = max(0.25, min(float(request.args.get('speed', 1)), REPLAY_MAX_SPEED))
+    except ValueError:
+        return jsonify({'error': 'speed must be a number'}), 400
+    tick_rate = header.get('tick_rate', TICK_RATE)
+    frame_ticks = tick_rate // BROADCAST_RATE
+    recorded_points = [(tick, side) for tick, kind, side in records if kind == 'point']
+
+    def frames():
+        yield json.dumps({'header': header, 'speed': speed}) + '\n'
+        encoder = SnapshotEncoder()
+        points = []
+        winner = None
+        room = None
+        next_frame = time.monotonic()
+        for room, scoring_side, winner_side in replay(header, records):
+            match_ms = room.tick * 1000 // tick_rate
+            if scoring_side:
+                points.append((room.tick, scoring_side))
+                yield json.dumps({'pong_score': {'t': room.tick, 'st': match_ms, 'scoring_side': scoring_side,
+                                                 'score': room.game_state.score.to_wire()}}) + '\n'
+            if room.tick % frame_ticks and not winner_side:
+                continue
+            yield json.dumps({'pong_update': encoder.encode(room.game_state, room.tick, match_ms)}) + '\n'
+            winner = winner_side
+            next_frame += frame_ticks / (tick_rate * speed)
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                socketio.sleep(delay)
+        yield json.dumps({
+            'end': True,
+            'tick': room.tick if room else 0,
+            'winner': winner,
+            'score': room.game_state.score.to_wire() if room else None,
+            'verified': points == recorded_points
+        }) + '\n'
+
+    return Response(stream_with_context(frames()), mimetype='application/x-ndjson')
+
 
 @app.route("/game/<room_id>")
 def game(room_id):
     if "username" not in session:
         return redirect(url_for("login"))
-    room = Room.query.filter_by(id=room_id).first()
+    if not _owns_room(room_id):
+        # Sticky routing: the room's page and socket live on its owning shard
+        return redirect(shards.room_url(room_id, request.full_path.rstrip('?')))
+    with db_join_seconds.time():
+        room = Room.query.filter_by(id=room_id).first()
     if not room:
         return redirect(url_for("dashboard"))
 
@@ -354,71 +729,70 @@ def game(room_id):
     if room_id not in active_rooms:
         creator_name = "Unknown"
         if room.created_by:
-            creator = User.query.get(room.created_by)
+            with db_join_seconds.time():
+                creator = User.query.get(room.created_by)
             if creator:
                 creator_name = creator.username
         
-        active_rooms[room_id] = {
-            'members': set(),
-            'mode': room.mode,
-            'win_points': getattr(room, 'win_points', 5),  # Fallback to 5 if column doesn't exist
-            'players': {'left': None, 'right': None},
-            'game_state': {
-                'ball': {'x': 400, 'y': 300, 'dx': 5, 'dy': 3},
-                'paddles': {'left': {'y': 250}, 'right': {'y': 250}},
-                'score': {'left': 0, 'right': 0}
-            },
-            'game_running': False,
-            'winner': None,
-            'room_creator': creator_name
-        }
+        active_rooms[room_id] = new_room_state(
+            room.mode,
+            getattr(room, 'win_points', 5),  # Fallback to 5 if column doesn't exist
+            room_creator=creator_name,
+            broadcast_hz=_broadcast_rate(getattr(room, 'broadcast_hz', None))
+        )
     return render_template("game.html", room_id=room_id, username=session["username"])
 
 @socketio.on("disconnect")
 def handle_disconnect():
-    username = session.get("username")
-    print(f"User disconnected: {username}")
-    if username:
-        # Remove user from all active rooms
-        rooms_to_clean = []
-        for room_id, state in active_rooms.items():
-            if username in state['members']:
-                print(f"Removing {username} from room {room_id}")
-                state['members'].discard(username)
-                
-                # Clear paddle assignment
-                if state['players']['left'] == username:
-                    state['players']['left'] = None
-                elif state['players']['right'] == username:
-                    state['players']['right'] = None
-                
-                # Stop game if running and player disconnected
-                if state['game_running']:
-                    state['game_running'] = False
-                    state['winner'] = None
-                
-                # Emit room update
-                socketio.emit('room_updated', {
-                    'room_id': room_id,
-                    'players': len(state['members'])
-                })
-                
-                # Notify remaining players
-                socketio.emit("user_left", {
-                    "username": username,
-                    "players": state['players'],
-                    "members": list(state['members'])
-                }, room=room_id)
-                
-                # Mark room for cleanup if empty
-                if len(state['members']) == 0:
-                    rooms_to_clean.append(room_id)
-        
-        # Clean up empty rooms
-        for room_id in rooms_to_clean:
-            del active_rooms[room_id]
-        
-        # No global user disconnected broadcast needed
+    _stop_spectating(request.sid)
+    entry = memberships.remove_sid(request.sid)
+    if not entry:
+        return
+    username, room_id, side = entry
+    log_join.info("disconnected", user=username, room=room_id)
+    state = active_rooms.get(room_id)
+    if not state:
+        return
+    state.drop_sid(request.sid)
+    # Another tab of the same user keeps them in the room
+    if memberships.in_room(username, room_id) or username not in state.members:
+        return
+
+    log_join.info("left", user=username, room=room_id, reason="disconnect")
+    state.members.discard(username)
+
+    # Clear paddle assignment
+    if side and state.players.get(side) == username:
+        state.players[side] = None
+
+    # Stop game if running and player disconnected
+    if state.game_running:
+        state.game_running = False
+        state.winner = None
+        scheduler.remove(room_id)
+    active_rooms.put(room_id, state)  # republish members and running flag
+
+    # Emit room update
+    _announce_room_updated(room_id, len(state.members))
+
+    # Notify remaining players
+    socketio.emit("user_left", {
+        "username": username,
+        "players": state.players,
+        "members": list(state.members)
+    }, room=room_id)
+
+    # Clean up empty room; the reaper deletes it if nobody comes back
+    if not state.members:
+        _drop_spectators(room_id, state)
+        del active_rooms[room_id]  # its game, if any, left the scheduler above
+        reaper.mark_empty(room_id)
+
+@socketio.on("join_lobby")
+def handle_join_lobby(data=None):
+    """Dashboard sockets subscribe to lobby_diff updates"""
+    if session.get("username"):
+        join_room(LOBBY_ROOM)
 
 @socketio.on("join_room")
 def handle_join(data):
@@ -436,16 +810,22 @@ def handle_join(data):
             emit("error", {"message": "Not authenticated"})
             return
 
-    print(f"=== JOIN ROOM ATTEMPT ===")
-    print(f"Room ID: {room_id}")
-    print(f"Username: {username}")
-    print(f"Active rooms: {list(active_rooms.keys())}")
+    if not _owns_room(room_id):
+        emit("shard_redirect", {"url": shards.room_url(room_id, url_for("game", room_id=room_id))})
+        return
 
-    room = Room.query.filter_by(id=room_id).first()
+    log_join.debug("join_attempt", room=room_id, user=username)
+
+    with db_join_seconds.time():
+        room = Room.query.filter_by(id=room_id).first()
     if not room:
         emit("error", {"message": "Room not found"})
         return
 
+    if data.get('spectate'):
+        _join_as_spectator(room_id, room, username, data.get('wire'))
+        return
+
     # private room access check
     if room.type == 'private':
         # Check if user is the room creator - they get immediate access
@@ -467,57 +847,60 @@ def handle_join(data):
     if not state:
         creator_name = "Unknown"
         if room.created_by:
-            creator = User.query.get(room.created_by)
+            with db_join_seconds.time():
+                creator = User.query.get(room.created_by)
             if creator:
                 creator_name = creator.username
         
-        state = {
-            'members': set(),
-            'mode': room.mode,
-            'win_points': getattr(room, 'win_points', 5),  # Fallback to 5 if column doesn't exist
-            'players': {'left': None, 'right': None},
-            'game_state': {
-                'ball': {'x': 400, 'y': 300, 'dx': 4, 'dy': 2},  # Use consistent starting values
-                'paddles': {'left': {'y': 250}, 'right': {'y': 250}},
-                'score': {'left': 0, 'right': 0}
-            },
-            'game_running': False,
-            'winner': None,
-            'room_creator': creator_name
-        }
+        state = new_room_state(
+            room.mode,
+            getattr(room, 'win_points', 5),  # Fallback to 5 if column doesn't exist
+            room_creator=creator_name,
+            broadcast_hz=_broadcast_rate(getattr(room, 'broadcast_hz', None))
+        )
         active_rooms[room_id] = state
-        print(f"Created new room state for {room_id}")
+        log_join.debug("room_state_created", room=room_id, mode=state.mode)
 
     # enforce player limit and room access rules
-    current_players = state['members']
+    current_players = state.members
     
     # Bot mode: lock room to creator and force assignments; allow creator to (re)join anytime
-    if state.get('mode') == 'bot':
-        if username != state['room_creator']:
+    if state.mode == 'bot':
+        if username != state.room_creator:
             emit("error", {"message": "Only room creator can join vs Computer rooms"})
             return
         # Force single-member room with correct paddle assignments
-        state['members'] = {username}
-        state['players']['left'] = 'Computer'
-        state['players']['right'] = username
+        state.members = {username}
+        state.players['left'] = 'Computer'
+        state.players['right'] = username
         your_paddle = 'right'
         join_room(room_id)
-        socketio.emit('room_updated', { 'room_id': room_id, 'players': len(state['members']) })
+        memberships.add(request.sid, username, room_id, your_paddle)
+        reaper.mark_occupied(room_id)
+        wire = _join_state_frames(room_id, state, data.get('wire'))
+        active_rooms.put(room_id, state)
+        log_join.info("joined", room=room_id, user=username, mode=state.mode, paddle=your_paddle,
+                      members=len(state.members), wire=wire)
+        _announce_room_updated(room_id, len(state.members))
         emit('pong_init', {
-            'game_state': state['game_state'],
-            'game_running': state['game_running'],
-            'winner': state['winner'],
+            'game_state': state.game_state.to_wire(),
+            'game_running': state.game_running,
+            'winner': state.winner,
             'you': your_paddle,
-            'players': state['players'],
-            'mode': state['mode'],
-            'win_points': state.get('win_points', 5),
-            'room_creator': state['room_creator'],
-            'is_creator': True
+            'players': state.players,
+            'mode': state.mode,
+            'win_points': state.win_points,
+            'room_creator': state.room_creator,
+            'is_creator': True,
+            'wire': wire,
+            'wire_version': WIRE_VERSION,
+            'tick_rate': TICK_RATE,
+            'broadcast_hz': state.broadcast_hz
         })
         emit("players_update", {
-            "players": state['players'],
-            "members": list(state['members']),
-            "room_creator": state['room_creator']
+            "players": state.players,
+            "members": list(state.members),
+            "room_creator": state.room_creator
         }, room=room_id)
         return
     else:
@@ -526,24 +909,24 @@ def handle_join(data):
     
     # If user is already in the room, just reconnect them
     if username in current_players:
-        print(f"User {username} already in room {room_id}, reconnecting...")
+        log_join.debug("rejoin", room=room_id, user=username)
         # Don't add them again, just assign their paddle
-        your_paddle = 'left' if state['players'].get('left') == username else ('right' if state['players'].get('right') == username else None)
+        your_paddle = 'left' if state.players.get('left') == username else ('right' if state.players.get('right') == username else None)
         if not your_paddle:
             # Reassign paddle respecting creator preference (creator -> right, guest -> left) in PvP
-            if state['mode'] == 'pvp':
-                preferred = 'right' if username == state['room_creator'] else 'left'
+            if state.mode == 'pvp':
+                preferred = 'right' if username == state.room_creator else 'left'
                 other = 'left' if preferred == 'right' else 'right'
-                if state['players'][preferred] is None:
-                    state['players'][preferred] = username
+                if state.players[preferred] is None:
+                    state.players[preferred] = username
                     your_paddle = preferred
-                elif state['players'][other] is None:
-                    state['players'][other] = username
+                elif state.players[other] is None:
+                    state.players[other] = username
                     your_paddle = other
             else:
                 # Bot mode: enforce Computer on left, human on right
-                state['players']['left'] = 'Computer'
-                state['players']['right'] = username
+                state.players['left'] = 'Computer'
+                state.players['right'] = username
                 your_paddle = 'right'
     else:
         # New user joining
@@ -552,521 +935,624 @@ def handle_join(data):
             return
         
         # Add new user to members
-        state['members'].add(username)
-        print(f"Added {username} to room {room_id}. Total members: {len(state['members'])}")
+        state.members.add(username)
         
         # assign paddle positions (left/right) for new users
-        if state['mode'] == 'bot':
+        if state.mode == 'bot':
             # In bot mode: Computer is left, player is right
-            state['players']['left'] = 'Computer'
-            state['players']['right'] = username
+            state.players['left'] = 'Computer'
+            state.players['right'] = username
             your_paddle = 'right'
         else:
             # PvP mode: assign positions so creator is right, guest is left
-            preferred = 'right' if username == state['room_creator'] else 'left'
+            preferred = 'right' if username == state.room_creator else 'left'
             other = 'left' if preferred == 'right' else 'right'
-            if state['players'][preferred] is None:
-                state['players'][preferred] = username
+            if state.players[preferred] is None:
+                state.players[preferred] = username
                 your_paddle = preferred
-            elif state['players'][other] is None:
-                state['players'][other] = username
+            elif state.players[other] is None:
+                state.players[other] = username
                 your_paddle = other
             else:
                 # already assigned, find existing assignment
-                your_paddle = 'left' if state['players']['left'] == username else ('right' if state['players']['right'] == username else None)
-    
-    # Debug logging
-    print(f"Player {username} joined room {room_id}, mode: {state['mode']}, paddle: {your_paddle}")
-    print(f"Current players: {state['players']}")
-    print(f"Members: {state['members']}")
+                your_paddle = 'left' if state.players['left'] == username else ('right' if state.players['right'] == username else None)
     
-    # Join the Socket.IO room
+    # Join the Socket.IO room and the state-frame channel for the negotiated wire
     join_room(room_id)
-    print(f"User {username} joined Socket.IO room {room_id}")
+    memberships.add(request.sid, username, room_id, your_paddle)
+    reaper.mark_occupied(room_id)
+    wire = _join_state_frames(room_id, state, data.get('wire'))
+    log_join.info("joined", room=room_id, user=username, mode=state.mode, paddle=your_paddle,
+                  members=len(state.members), wire=wire)
+
+    active_rooms.put(room_id, state)
 
     # Emit realtime room update to dashboard
-    socketio.emit('room_updated', {
-        'room_id': room_id,
-        'players': len(state['members'])
-    })
+    _announce_room_updated(room_id, len(state.members))
 
     # notify the joiner with game state
     emit('pong_init', {
-        'game_state': state['game_state'],
-        'game_running': state['game_running'],
-        'winner': state['winner'],
+        'game_state': state.game_state.to_wire(),
+        'game_running': state.game_running,
+        'winner': state.winner,
         'you': your_paddle,
-        'players': state['players'],
-        'mode': state['mode'],
-        'win_points': state.get('win_points', 5),
-        'room_creator': state['room_creator'],
-        'is_creator': username == state['room_creator']
+        'players': state.players,
+        'mode': state.mode,
+        'win_points': state.win_points,
+        'room_creator': state.room_creator,
+        'is_creator': username == state.room_creator,
+        'wire': wire,
+        'wire_version': WIRE_VERSION,
+        'tick_rate': TICK_RATE,
+        'broadcast_hz': state.broadcast_hz
     })
     
-    print(f"Sent pong_init to {username} with paddle: {your_paddle}")
-    
     # notify room about players update
     emit("players_update", {
-        "players": state['players'],
-        "members": list(state['members']),
-        "room_creator": state['room_creator']
+        "players": state.players,
+        "members": list(state.members),
+        "room_creator": state.room_creator
     }, room=room_id)
     
-    print(f"Sent players_update to room {room_id}: {state['players']}")
-    
     # Send confirmation to the joining user
     emit("join_success", {
         "message": f"Successfully joined room {room_id}",
         "paddle": your_paddle,
-        "mode": state['mode']
+        "mode": state.mode
     })
 
-def _check_winner(score, win_points=5):
-    """Check if someone won (first to win_points)"""
-    if score['left'] >= win_points:
-        return 'left'
-    elif score['right'] >= win_points:
-        return 'right'
-    return None
+def _join_as_spectator(room_id, room, username, wire):
+    """Watch a running public room: no paddle, not a member, frames at SPECTATOR_HZ"""
+    state = active_rooms.get(room_id)
+    if room.type != 'public':
+        emit("error", {"message": "Only public rooms can be watched"})
+        return
+    if not state or not state.game_running:
+        emit("error", {"message": "No game in progress to watch"})
+        return
+    if request.sid not in state.spectators and len(state.spectators) >= MAX_SPECTATORS:
+        emit("error", {"message": f"Room full ({MAX_SPECTATORS} spectators max)"})
+        return
 
-def _update_computer_paddle(game_state):
-    """Update computer paddle position with smooth AI for new dimensions"""
-    ball = game_state['ball']
-    computer_paddle = game_state['paddles']['left']
-    
-    paddle_height = 80  # Updated to match new paddle height
-    canvas_height = 600  # Updated to match new canvas height
-    paddle_width = 10
-    left_paddle_x = 10
-    
-    # Initialize AI state if not present
-    if 'ai_state' not in computer_paddle:
-        computer_paddle['ai_state'] = {
-            'target_y': 250,  # Updated center position
-            'current_velocity': 0,
-            'reaction_delay': 0,
-            'last_ball_x': ball['x'],
-            'prediction_time': 0
-        }
-    
-    ai_state = computer_paddle['ai_state']
-    
-    # Only react when ball is moving towards computer paddle
-    if ball['dx'] < 0:  # Ball moving left
-        # Calculate time until ball reaches paddle
-        time_to_paddle = (ball['x'] - left_paddle_x - paddle_width) / abs(ball['dx']) if ball['dx'] != 0 else 0
-        
-        # Predict where ball will be when it reaches the paddle
-        predicted_y = ball['y'] + (ball['dy'] * time_to_paddle)
-        
-        # Add some prediction error (makes AI more human-like)
-        prediction_error = random.uniform(-20, 20)  # Slightly increased for taller canvas
-        predicted_y += prediction_error
-        
-        # Target is center of paddle aligned with predicted ball position
-        target_y = predicted_y - (paddle_height // 2)
-        
-        # Add reaction delay (AI doesn't react instantly)
-        ai_state['reaction_delay'] = max(0, ai_state['reaction_delay'] - 1)
-        if ai_state['reaction_delay'] > 0:
-            target_y = ai_state['target_y']  # Keep previous target during delay
-        
-        # Occasionally miss the target (human-like mistakes)
-        if random.random() < 0.02:  # 2% chance of mistake
-            target_y += random.uniform(-40, 40)  # Increased range for taller canvas
-        
-        ai_state['target_y'] = target_y
-        ai_state['prediction_time'] = time_to_paddle
-    else:
-        # Ball moving away, slowly return to center
-        ai_state['target_y'] = (canvas_height - paddle_height) // 2
-        ai_state['reaction_delay'] = random.randint(3, 8)  # Random reaction delay
-    
-    # Clamp target to valid range
-    ai_state['target_y'] = max(0, min(canvas_height - paddle_height, ai_state['target_y']))
-    
-    # Current paddle position
-    current_y = computer_paddle['y']
-    
-    # Smooth movement with acceleration/deceleration
-    target_velocity = (ai_state['target_y'] - current_y) * 0.08  # Proportional control
-    
-    # Limit maximum velocity for smooth movement
-    max_velocity = 1.5  # Slightly increased for taller canvas
-    target_velocity = max(-max_velocity, min(max_velocity, target_velocity))
-    
-    # Smooth acceleration
-    acceleration = 0.15  # Slightly increased for more responsive movement
-    if target_velocity > ai_state['current_velocity']:
-        ai_state['current_velocity'] = min(target_velocity, ai_state['current_velocity'] + acceleration)
-    elif target_velocity < ai_state['current_velocity']:
-        ai_state['current_velocity'] = max(target_velocity, ai_state['current_velocity'] - acceleration)
-    
-    # Apply velocity to position
-    new_y = current_y + ai_state['current_velocity']
-    
-    # Ensure paddle stays within bounds
-    new_y = max(0, min(canvas_height - paddle_height, new_y))
-    
-    # If we hit the boundary, stop velocity in that direction
-    if new_y <= 0 or new_y >= canvas_height - paddle_height:
-        ai_state['current_velocity'] = 0
-    
-    computer_paddle['y'] = new_y
-    
-    # Update last ball position for next frame
-    ai_state['last_ball_x'] = ball['x']
-
-def _update_ball_position(game_state):
-    """Update ball position and handle collisions with improved physics"""
-    ball = game_state['ball']
-    paddles = game_state['paddles']
-    score = game_state['score']
-    
-    # Update ball position
-    ball['x'] += ball['dx']
-    ball['y'] += ball['dy']
-    
-    # Constants to match client rendering - adjusted dimensions
-    ball_radius = 8
-    canvas_width = 800
-    canvas_height = 600  # Increased height for better proportions
-    left_paddle_x = 10
-    right_paddle_x = canvas_width - 20
-    paddle_width = 10
-    paddle_height = 80  # Slightly taller paddles
-
-    # Ball collision with top and bottom walls
-    if ball['y'] <= ball_radius:
-        ball['y'] = ball_radius
-        ball['dy'] = abs(ball['dy'])  # Bounce down
-    elif ball['y'] >= canvas_height - ball_radius:
-        ball['y'] = canvas_height - ball_radius
-        ball['dy'] = -abs(ball['dy'])  # Bounce up
-    
-    # Ball collision with paddles - improved collision detection
-    # Left paddle collision
-    if (ball['x'] - ball_radius <= left_paddle_x + paddle_width and 
-        ball['x'] + ball_radius >= left_paddle_x and 
-        ball['y'] + ball_radius >= paddles['left']['y'] and 
-        ball['y'] - ball_radius <= paddles['left']['y'] + paddle_height):
-        
-        # Ensure ball doesn't get stuck inside paddle
-        ball['x'] = left_paddle_x + paddle_width + ball_radius
-        
-        # Calculate relative intersection point (-1 to 1)
-        relative_intersect_y = (paddles['left']['y'] + (paddle_height/2)) - ball['y']
-        normalized_relative_intersection_y = relative_intersect_y / (paddle_height/2)
-        
-        # Clamp to prevent extreme angles
-        normalized_relative_intersection_y = max(-0.8, min(0.8, normalized_relative_intersection_y))
-        
-        # Calculate bounce angle (between -30 and 30 degrees for more controlled gameplay)
-        bounce_angle = normalized_relative_intersection_y * (math.pi/6)  # 30 degrees max angle
-        
-        # Calculate new direction with controlled speed increase
-        current_speed = math.sqrt(ball['dx']**2 + ball['dy']**2)
-        new_speed = min(current_speed * 1.02, 12)  # Max speed cap to prevent runaway
-        
-        ball['dx'] = new_speed * math.cos(bounce_angle)
-        ball['dy'] = -new_speed * math.sin(bounce_angle)
-        
-        # Ensure ball moves right after hitting left paddle
-        ball['dx'] = abs(ball['dx'])
-        
-        # Ensure minimum horizontal speed to prevent vertical-only movement
-        if abs(ball['dx']) < 2:
-            ball['dx'] = 2 if ball['dx'] > 0 else -2
-    
-    # Right paddle collision
-    if (ball['x'] + ball_radius >= right_paddle_x and 
-        ball['x'] - ball_radius <= right_paddle_x + paddle_width and 
-        ball['y'] + ball_radius >= paddles['right']['y'] and 
-        ball['y'] - ball_radius <= paddles['right']['y'] + paddle_height):
-        
-        # Ensure ball doesn't get stuck inside paddle
-        ball['x'] = right_paddle_x - ball_radius
-        
-        # Calculate relative intersection point (-1 to 1)
-        relative_intersect_y = (paddles['right']['y'] + (paddle_height/2)) - ball['y']
-        normalized_relative_intersection_y = relative_intersect_y / (paddle_height/2)
-        
-        # Clamp to prevent extreme angles
-        normalized_relative_intersection_y = max(-0.8, min(0.8, normalized_relative_intersection_y))
-        
-        # Calculate bounce angle (between -30 and 30 degrees for more controlled gameplay)
-        bounce_angle = normalized_relative_intersection_y * (math.pi/6)  # 30 degrees max angle
-        
-        # Calculate new direction with controlled speed increase
-        current_speed = math.sqrt(ball['dx']**2 + ball['dy']**2)
-        new_speed = min(current_speed * 1.02, 12)  # Max speed cap to prevent runaway
-        
-        ball['dx'] = -new_speed * math.cos(bounce_angle)
-        ball['dy'] = -new_speed * math.sin(bounce_angle)
-        
-        # Ensure ball moves left after hitting right paddle
-        ball['dx'] = -abs(ball['dx'])
-        
-        # Ensure minimum horizontal speed to prevent vertical-only movement
-        if abs(ball['dx']) < 2:
-            ball['dx'] = 2 if ball['dx'] > 0 else -2
-    
-    # Score points (ball went past boundaries)
-    if ball['x'] < -ball_radius*2:  # Ball went past left boundary
-        score['right'] += 1
-        return 'right'
-    elif ball['x'] > canvas_width + ball_radius*2:  # Ball went past right boundary
-        score['left'] += 1
-        return 'left'
-    
-    return None
+    _stop_spectating(request.sid)  # one room at a time
+    wire = WIRE_BINARY if wire == WIRE_BINARY else WIRE_JSON
+    state.spectators[request.sid] = wire
+    spectating[request.sid] = room_id
+    join_room(room_id)  # scores, game over and player changes
+    join_room(_spectator_room(room_id, wire))
+    state.spectator_snapshots.request_keyframe()
+    log_join.info("spectating", room=room_id, user=username, spectators=len(state.spectators), wire=wire)
 
-def _reset_ball(ball):
-    """Reset ball to center with controlled random direction"""
-    ball['x'] = 400  # Center of 800 width
-    ball['y'] = 300  # Center of 600 height
-    # Ensure non-zero dy for visible motion; controlled speed
-    ball['dx'] = random.choice([-4, 4])  # Reduced speed for better control
-    ball['dy'] = random.choice([-2, -1, 1, 2])  # Reduced vertical speed
-    
-    # Ensure minimum speeds to prevent stuck balls
-    if abs(ball['dx']) < 2:
-        ball['dx'] = 2 if ball['dx'] > 0 else -2
-    if abs(ball['dy']) < 1:
-        ball['dy'] = 1 if ball['dy'] > 0 else -1
+    emit('pong_init', {
+        'game_state': state.game_state.to_wire(),
+        'game_running': state.game_running,
+        'winner': state.winner,
+        'you': None,
+        'spectator': True,
+        'spectators': len(state.spectators),
+        'players': state.players,
+        'mode': state.mode,
+        'win_points': state.win_points,
+        'room_creator': state.room_creator,
+        'is_creator': False,
+        'wire': wire,
+        'wire_version': WIRE_VERSION,
+        'tick_rate': TICK_RATE,
+        'broadcast_hz': SPECTATOR_HZ
+    })
+
+
+def _stop_spectating(sid):
+    """Remove a socket from the room it watches; returns that room id or None"""
+    room_id = spectating.pop(sid, None)
+    if room_id is None:
+        return None
+    state = active_rooms.get(room_id)
+    if state:
+        state.spectators.pop(sid, None)
+    _leave_spectator_rooms(sid, room_id)
+    return room_id
+
+
+def _drop_spectators(room_id, state):
+    """Detach every spectator of a room whose state is being dropped, and send them to the lobby"""
+    for sid in list(state.spectators):
+        if spectating.get(sid) == room_id:
+            del spectating[sid]
+        _leave_spectator_rooms(sid, room_id)
+        socketio.emit('room_dissolved', {'room_id': room_id}, room=sid)
+    state.spectators.clear()
+
+
+def _leave_spectator_rooms(sid, room_id):
+    for name in (room_id, _spectator_room(room_id, WIRE_JSON), _spectator_room(room_id, WIRE_BINARY)):
+        socketio.server.leave_room(sid, name)
+
+
+def _spectator_room(room_id, wire):
+    """Socket.IO room receiving a room's spectator frames in one encoding"""
+    return f"{room_id}/spectate/{wire}"
+
+def _wire_room(room_id, wire):
+    """Socket.IO room receiving a room's state frames in one encoding"""
+    return f"{room_id}/{wire}"
+
+def _join_state_frames(room_id, state, wire):
+    """Subscribe the current socket to JSON (default) or binary state frames"""
+    wire = WIRE_BINARY if wire == WIRE_BINARY else WIRE_JSON
+    other = WIRE_JSON if wire == WIRE_BINARY else WIRE_BINARY
+    state.set_wire(request.sid, wire)
+    leave_room(_wire_room(room_id, other))
+    join_room(_wire_room(room_id, wire))
+    # Joiner needs a full frame before deltas
+    state.snapshots.request_keyframe()
+    return wire
 
 @socketio.on('pong_paddle_move')
 def on_pong_paddle_move(data):
+    paddle_moves.inc()
     room_id = data.get('room_id')
     if room_id not in active_rooms:
         return
     
     room = active_rooms[room_id]
-    if not room['game_running'] and room['mode'] != 'bot':
+    if not room.game_running and room.mode != 'bot':
         return
     
     username = session.get('username')
-    if not username:
-        return
+    if not username or request.sid in spectating:
+        return  # spectators are read-only, even in a player's session
     
     # Determine which paddle this user controls
     paddle_side = None
-    if room['players'].get('left') == username:
+    if room.players.get('left') == username:
         paddle_side = 'left'
-    elif room['players'].get('right') == username:
+    elif room.players.get('right') == username:
         paddle_side = 'right'
     
     if not paddle_side:
         return
     
-    paddle = room['game_state']['paddles'][paddle_side]
     paddle_height = 80  # Updated to match new paddle height
     canvas_height = 600  # Updated to match new canvas height
 
-    # Support absolute mouse movement (y) and keyboard (direction)
-    if 'y' in data:
+    # Latest target for this side; keyboard steps build on a target not yet applied
+    current_y = room.pending_input.get(paddle_side)
+    if current_y is None:
+        current_y = room.game_state.paddle(paddle_side).y
+
+    # Support binary frames, absolute mouse movement (y) and keyboard (direction)
+    if 'b' in data:
+        mouse_y = decode_paddle_move(data.get('b'))
+        if mouse_y is None:
+            log_transport.limited(logging.WARNING, "paddle_move_invalid", room=room_id, user=username)
+            return
+        target_y = mouse_y - (paddle_height / 2.0)
+    elif 'y' in data:
         # y is canvas-relative already from the client
         try:
             target_y = float(data.get('y')) - (paddle_height / 2.0)
         except (TypeError, ValueError):
-            target_y = paddle['y']
-        # Clamp within bounds
-        paddle['y'] = max(0, min(canvas_height - paddle_height, target_y))
+            log_transport.limited(logging.WARNING, "paddle_move_invalid", room=room_id, user=username)
+            return
     else:
         # Fallback to direction-based movement
         direction = data.get('direction')
-        if not direction:
-            return
         paddle_speed = 25  # Slightly increased for taller canvas
         if direction == 'up':
-            paddle['y'] = max(0, paddle['y'] - paddle_speed)
+            target_y = current_y - paddle_speed
         elif direction == 'down':
-            paddle['y'] = min(canvas_height - paddle_height, paddle['y'] + paddle_speed)
-    
-    # Update the game state
-    room['game_state']['paddles'][paddle_side] = paddle
+            target_y = current_y + paddle_speed
+        else:
+            return
     
-    # Emit the updated paddle position to all clients
-    emit('pong_paddle_update', {
-        'paddle': paddle_side,
-        'y': paddle['y']
-    }, room=room_id, include_self=True)
+    # Clamp within bounds; applied once on the next simulation tick and sent
+    # to clients as part of the regular state frame
+    room.pending_input[paddle_side] = max(0, min(canvas_height - paddle_height, target_y))
+    if not room.game_running:
+        _apply_inputs(room_id, room)
+    elif batch_engine is not None:
+        scheduler.input_rooms.add(room_id)
+    # otherwise pong_sim.step applies it as the input of the room's next tick
+
+def _apply_inputs(room_id, room):
+    """Move paddles to the latest target received for each side since the last tick"""
+    if batch_engine is not None:
+        for side in ('left', 'right'):
+            if room.pending_input[side] is not None:
+                batch_engine.set_paddle(room_id, side, room.pending_input[side])
+    apply_inputs(room)
+    room.frames.invalidate()
 
 @socketio.on('pong_start_game')
 def on_pong_start_game(data):
     room_id = data.get('room_id')
     username = session.get('username')
     
-    print(f"=== GAME START ATTEMPT ===")
-    print(f"Room ID: {room_id}")
-    print(f"Username: {username}")
-    print(f"Active rooms: {list(active_rooms.keys())}")
+    log_sim.debug("start_attempt", room=room_id, user=username)
     
     if room_id not in active_rooms:
-        print(f"ERROR: Room {room_id} not found in active_rooms")
+        log_sim.warning("start_rejected", room=room_id, user=username, reason="room not active")
         emit('error', {'message': f'Room {room_id} not found'})
         return
         
     if not username:
-        print(f"ERROR: No username in session")
+        log_sim.warning("start_rejected", room=room_id, reason="not authenticated")
         emit('error', {'message': 'Not authenticated'})
         return
         
     state = active_rooms[room_id]
     
-    # Debug logging
-    print(f"Game start attempt by {username} in room {room_id}")
-    print(f"Mode: {state['mode']}, Members: {state['members']}, Players: {state['players']}")
-    print(f"Room creator: {state['room_creator']}")
-    print(f"Game running: {state['game_running']}")
-    
     # Permissions: Room creator can always start. In bot mode, allow the human player to start as well.
-    if username != state['room_creator']:
-        if state.get('mode') == 'bot' and state['players'].get('right') == username:
+    if username != state.room_creator:
+        if state.mode == 'bot' and state.players.get('right') == username:
             pass
         else:
-            print(f"ERROR: {username} is not room creator {state['room_creator']}")
+            log_sim.warning("start_rejected", room=room_id, user=username, reason="not room creator")
             emit('error', {'message': 'Only room creator can start game'})
             return
     
     # Check if we can start the game
-    if state['mode'] == 'bot':
+    if state.mode == 'bot':
         # Bot mode: ensure assignments exist, then allow start
-        if not state['players'].get('left'):
-            state['players']['left'] = 'Computer'
-        if not state['players'].get('right'):
+        if not state.players.get('left'):
+            state.players['left'] = 'Computer'
+        if not state.players.get('right'):
             # Prefer the requesting user as the human player
-            state['players']['right'] = username
+            state.players['right'] = username
     else:
         # PvP mode: need 2 human players
-        if len(state['members']) < 2:
-            emit('error', {'message': f'Need 2 players to start (currently {len(state["members"])})'})
+        if len(state.members) < 2:
+            emit('error', {'message': f'Need 2 players to start (currently {len(state.members)})'})
             return
     
     # Also check that both paddle positions are assigned
-    if not state['players']['left'] or not state['players']['right']:
+    if not state.players['left'] or not state.players['right']:
         emit('error', {'message': 'Both paddle positions must be filled'})
         return
     
-    if state['game_running']:
+    if state.game_running:
         emit('error', {'message': 'Game already running'})
         return
     
     # Start game
-    state['game_running'] = True
-    state['winner'] = None
+    state.game_running = True
+    state.winner = None
     
-    print(f"Game started in room {room_id}!")
-    print(f"Final state check - Members: {state['members']}, Players: {state['players']}")
+    log_sim.info("game_started", room=room_id, mode=state.mode, left=state.players['left'],
+                 right=state.players['right'], win_points=state.win_points)
     
     # Reset game state
-    state['game_state'] = {
-        'ball': {'x': 400, 'y': 300, 'dx': 4, 'dy': 2},  # Use consistent starting values
-        'paddles': {'left': {'y': 250}, 'right': {'y': 250}},
-        'score': {'left': 0, 'right': 0}
-    }
+    state.reset_game()
     
-    # Start game loop in a separate thread for proper multiplayer
-    game_thread = threading.Thread(target=game_loop, args=(room_id,))
-    game_thread.daemon = True
-    game_thread.start()
+    active_rooms.put(room_id, state)
+
+    # Record the match unless the batch engine, which pong_sim cannot replay, steps it
+    if batch_engine is None:
+        recordings.start(room_id, state, SERVE_DELAY_TICKS, TICK_RATE)
+        _schedule_recording_flush()
+
+    # Register with the shared simulation scheduler
+    scheduler.add(room_id)
     
     # Notify all players in the room that the game has started
-    emit('pong_game_started', {
-        'game_state': state['game_state']
-    }, room=room_id)
+    state.frames.emit(socketio.server, 'pong_game_started', room_id,
+                      lambda: {'game_state': state.frames.state_wire(state.game_state)})
     
-    # Also emit to dashboard for real-time updates
-    socketio.emit('game_started', {
-        'room_id': room_id,
-        'status': 'Game in progress'
-    })
+    # Also let dashboards know for real-time updates
+    _announce_game_started(room_id)
 
-# Game loop for each room
-def game_loop(room_id):
-    """Main game loop for Pong with consistent timing and frame rate"""
-    if room_id not in active_rooms:
-        print(f"Game loop: Room {room_id} not found in active_rooms")
-        return
-    
-    room = active_rooms[room_id]
-    print(f"Starting game loop for room {room_id}, mode: {room['mode']}")
-    
+# Shared simulation scheduler
+TICK_RATE = 60  # Fixed simulation steps per second
+BROADCAST_RATE = 20  # Default network updates per second
+BROADCAST_RATES = (10, 20, 30)  # Per-room choices; each divides TICK_RATE
+SPECTATOR_HZ = 5  # State frames per second for spectators; below every BROADCAST_RATES and divides TICK_RATE
+MAX_SPECTATORS = int(os.environ.get('PONG_MAX_SPECTATORS', 100))  # Per room
+SERVE_DELAY = 1.0  # Pause after a point before the ball is served again
+SERVE_DELAY_TICKS = int(SERVE_DELAY * TICK_RATE)
+
+
+def _broadcast_rate(value):
+    """Validate a room's broadcast rate, falling back to the default"""
     try:
-        last_time = time.time()
-        fixed_dt = 1.0 / 60.0  # Target 60 FPS for smoother gameplay
-        accumulator = 0.0
-        
-        while room_id in active_rooms and room['game_running']:
-            current_time = time.time()
-            frame_delta = min(current_time - last_time, 0.25)  # Prevent spiral of death
-            last_time = current_time
-            
-            accumulator += frame_delta
-            
-            # Fixed timestep updates for consistent gameplay
-            while accumulator >= fixed_dt and room_id in active_rooms and room['game_running']:
-                # Update ball position and check for scoring
-                scoring_side = _update_ball_position(room['game_state'])
-                if scoring_side:
-                    # On score, pause for 1 second and broadcast updated state
-                    print(f"Score! {scoring_side} side scored in room {room_id}")
-                    socketio.emit('pong_score', {
-                        'game_state': room['game_state'],
-                        'scoring_side': scoring_side
-                    }, room=room_id)
-                    time.sleep(1.0)  # Pause for 1 second
-                    # Reset ball after pause
-                    _reset_ball(room['game_state']['ball'])
-                    if scoring_side == 'right':
-                        room['game_state']['ball']['dx'] = abs(room['game_state']['ball']['dx'])
-                    else:
-                        room['game_state']['ball']['dx'] = -abs(room['game_state']['ball']['dx'])
-                
-                # Update computer paddle in bot mode with improved AI
-                if room['mode'] == 'bot' and 'left' in room['players'] and room['players']['left'] == 'Computer':
-                    _update_computer_paddle(room['game_state'])
-                
-                # Check for winner using room's win_points
-                winner_side = _check_winner(room['game_state']['score'], room.get('win_points', 5))
-                if winner_side:
-                    print(f"Game over! {winner_side} side won in room {room_id}")
-                    room['game_running'] = False
-                    room['winner'] = winner_side
-                    socketio.emit('pong_game_over', {
-                        'winner': winner_side,
-                        'game_state': room['game_state'],
-                        'score': room['game_state']['score'],
-                        'win_points': room.get('win_points', 5)
-                    }, room=room_id)
-
-                    break
-                
-                accumulator -= fixed_dt
-            
-            # Only send updates if game is still running
-            if room_id in active_rooms and room['game_running']:
-                # Emit game state to all clients less frequently (20 FPS) to reduce network traffic
-                if time.time() - room.get('last_update_time', 0) > 0.05:  # 20 FPS for network updates
-                    socketio.emit('pong_update', {
-                        'game_state': room['game_state']
-                    }, room=room_id)
-                    room['last_update_time'] = time.time()
-            
-            # Small sleep to prevent 100% CPU usage
-            time.sleep(0.001)
-            
+        rate = int(value)
+    except (TypeError, ValueError):
+        return BROADCAST_RATE
+    return rate if rate in BROADCAST_RATES else BROADCAST_RATE
+
+
+class TickScheduler:
+    """Steps every running room on one fixed 60 Hz timer; each room broadcasts at its own rate"""
+
+    def __init__(self, tick_rate=TICK_RATE):
+        self.tick_rate = tick_rate
+        self.fixed_dt = 1.0 / tick_rate
+        self.running_rooms = set()  # room ids currently stepped by the scheduler
+        self.input_rooms = set()  # batch-engine rooms with paddle input waiting for the next tick
+        self.tick_count = 0
+        self._task = None
+
+    def add(self, room_id, start=True):
+        """Register a room whose game has started (start=False leaves ticking to the caller)"""
+        self.running_rooms.add(room_id)
+        if batch_engine is not None:
+            room = active_rooms[room_id]
+            bots = {side: room.mode == 'bot' and room.players.get(side) == 'Computer' for side in ('left', 'right')}
+            batch_engine.add(room_id, room.game_state, room.win_points,
+                             bot_left=bots['left'], bot_right=bots['right'])
+        if start and self._task is None:
+            self._task = socketio.start_background_task(self._run)
+
+    def remove(self, room_id):
+        """Unregister a room (game over, dissolved or abandoned)"""
+        room = active_rooms.get(room_id)
+        recordings.finish(room_id, room.tick if room is not None else None)  # no-op after _end_game
+        self.running_rooms.discard(room_id)
+        self.input_rooms.discard(room_id)
+        if batch_engine is not None:
+            batch_engine.remove(room_id)
+
+    def _run(self):
+        """Fixed timestep loop; exits when no rooms are running"""
+        log_sim.info("scheduler_started", rooms=len(self.running_rooms))
+        next_tick = time.monotonic()
+        try:
+            while self.running_rooms:
+                now = time.monotonic()
+                behind = now - next_tick
+                if behind > 0.25:  # Prevent spiral of death
+                    ticks_skipped.inc(int(behind * self.tick_rate))
+                    next_tick = now
+                    behind = 0.0
+                ticks_behind.set(int(behind * self.tick_rate))
+                while next_tick <= now and self.running_rooms:
+                    started = time.perf_counter()
+                    self.tick()
+                    tick_seconds.observe(time.perf_counter() - started)
+                    ticks_total.inc()
+                    next_tick += self.fixed_dt
+                socketio.sleep(max(0.0, next_tick - time.monotonic()))
+        finally:
+            self._task = None
+            ticks_behind.set(0)
+            log_sim.info("scheduler_idle", ticks=self.tick_count)
+
+    def tick(self):
+        """Advance every running room by one fixed step"""
+        self.tick_count += 1
+        if self.input_rooms:
+            for room_id in self.input_rooms:
+                room = active_rooms.get(room_id)
+                if room is not None:
+                    _apply_inputs(room_id, room)
+            self.input_rooms.clear()
+        if batch_engine is not None:
+            self._tick_batch()
+            return
+        for room_id in list(self.running_rooms):
+            room = active_rooms.get(room_id)
+            if room is None or not room.game_running:
+                self.remove(room_id)
+                continue
+            try:
+                _step_room(room_id, room)
+            except Exception:
+                log_sim.exception("step_failed", room=room_id)
+                room.game_running = False
+                self.remove(room_id)
+                active_rooms.put(room_id, room)
+                continue
+            active_rooms.write_tick(room_id, room, self.tick_count)
+            # Emit game state less often than we simulate to reduce network traffic
+            if room.game_running and self.is_broadcast_tick(room):
+                _broadcast_state(room_id, room)
+            if room.spectators and self.is_spectator_tick():
+                _broadcast_spectators(room_id, room)
+
+    def is_broadcast_tick(self, room):
+        """True when this tick falls on the room's broadcast interval"""
+        return self.tick_count % (self.tick_rate // room.broadcast_hz) == 0
+
+    def is_spectator_tick(self):
+        return self.tick_count % (self.tick_rate // SPECTATOR_HZ) == 0
+
+    def _tick_batch(self):
+        """Advance every running room with one vectorized step of the batch engine"""
+        for room_id, scoring_side, winner_side in batch_engine.step():
+            room = active_rooms.get(room_id)
+            if room is None:
+                self.remove(room_id)
+                continue
+            batch_engine.export(room_id, room.game_state)
+            room.frames.invalidate()
+            _on_point_scored(room_id, room, scoring_side)
+            if winner_side:
+                _end_game(room_id, room, winner_side)
+        for room_id in list(self.running_rooms):
+            room = active_rooms.get(room_id)
+            if room is None or not room.game_running:
+                self.remove(room_id)
+                continue
+            spectator_tick = bool(room.spectators) and self.is_spectator_tick()
+            if not self.is_broadcast_tick(room) and not spectator_tick:
+                continue
+            batch_engine.export(room_id, room.game_state)
+            room.frames.invalidate()
+            active_rooms.write_tick(room_id, room, self.tick_count)
+            if self.is_broadcast_tick(room):
+                _broadcast_state(room_id, room)
+            if spectator_tick:
+                _broadcast_spectators(room_id, room)
+
+
+# Optional vectorized physics for all rooms at once (PONG_BATCH_PHYSICS=1, requires numpy)
+batch_engine = None
+if os.environ.get('PONG_BATCH_PHYSICS', '').lower() in ('1', 'true', 'yes'):
+    from pong_batch import BatchPhysics, numpy_available
+    if numpy_available():
+        batch_engine = BatchPhysics(serve_ticks=SERVE_DELAY_TICKS)
+        log_sim.info("batch_physics", enabled=True)
+    else:
+        log_sim.warning("batch_physics", enabled=False, reason="numpy is not installed")
+
+scheduler = TickScheduler()
+
+
+# Background cleanup of abandoned rooms
+ROOM_TTL = 300  # Seconds a room may stay empty before it is deleted
+REAP_INTERVAL = 5.0
+REAP_BATCH = 200  # Rooms deleted per pass (one commit, one notification)
+
+
+class RoomReaper:
+    """Deletes rooms that stayed empty for ROOM_TTL and reclaims rooms whose game loop died"""
+
+    def __init__(self, ttl=ROOM_TTL):
+        self.queue = EmptyRoomQueue(ttl)
+        self._task = None
+
+    def mark_empty(self, room_id, since=None):
+        """Start the room's TTL (no-op if it is already counting)"""
+        self.queue.mark_empty(room_id, time.time() if since is None else since)
+        self.start()
+
+    def mark_occupied(self, room_id):
+        self.queue.mark_occupied(room_id)
+
+    def start(self):
+        if self._task is None:
+            self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        """Periodic sweep; exits when there is nothing left to watch"""
+        log_lobby.info("reaper_started")
+        try:
+            while len(self.queue) or active_rooms:
+                socketio.sleep(REAP_INTERVAL)
+                with app.app_context():
+                    self.reap()
+        finally:
+            self._task = None
+            log_lobby.info("reaper_idle")
+
+    def reap(self, now=None):
+        """Expire one batch of empty rooms and reclaim orphaned ones; returns the dissolved ids"""
+        now = time.time() if now is None else now
+        self._reclaim_orphans(now)
+        expired = [rid for rid in self.queue.pop_expired(now, REAP_BATCH)
+                   if not _room_connected(rid) and (rid in active_rooms or rid in room_directory.rooms)]
+        if not expired:
+            return []
+        try:
+            Room.query.filter(Room.id.in_(expired)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log_lobby.error("reap_failed", rooms=len(expired), error=e)
+            for rid in expired:
+                self.queue.mark_empty(rid, now)  # try again after another TTL
+            return []
+        for rid in expired:
+            state = active_rooms.pop(rid, None)
+            if state:
+                _drop_spectators(rid, state)
+            scheduler.remove(rid)
+            _announce_room_dissolved(rid)  # the whole batch goes out in one lobby_diff
+        log_lobby.info("reaped", rooms=len(expired))
+        return expired
+
+    def _reclaim_orphans(self, now):
+        """End matches nothing is simulating and queue rooms nobody is connected to"""
+        loop_alive = scheduler._task is not None
+        for room_id, state in list(active_rooms.items()):
+            if state.game_running and (room_id not in scheduler.running_rooms or not loop_alive):
+                log_lobby.warning("orphaned_game", room=room_id)
+                _end_game(room_id, state, None)
+            if room_id not in self.queue and not _room_connected(room_id):
+                self.queue.mark_empty(room_id, now)
+
+
+reaper = RoomReaper()
+
+# Rooms left over from a previous run start their TTL from creation
+with app.app_context():
+    try:
+        _room_directory()
     except Exception as e:
-        print(f"Error in game loop for room {room_id}: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        # Clean up if room still exists
-        if room_id in active_rooms:
-            active_rooms[room_id]['game_running'] = False
-            print(f"Game loop ended for room {room_id}")
+        log_lobby.error("directory_load_failed", error=e)
+
+
+def _binary_frame(room):
+    return encode_frame(scheduler.tick_count, int(time.time() * 1000), room.game_state)
+
+
+def _broadcast_state(room_id, room):
+    """Send the room's state frame to everyone in it, encoded once per wire format (see fanout.py)"""
+    server = socketio.server
+    if room.binary_sids:
+        room.frames.emit(server, 'pong_update', _wire_room(room_id, WIRE_BINARY),
+                         lambda: _binary_frame(room), key='update:binary')
+    if room.json_sids:
+        room.frames.emit(server, 'pong_update', _wire_room(room_id, WIRE_JSON),
+                         lambda: room.snapshots.encode(room.game_state, scheduler.tick_count,
+                                                       int(time.time() * 1000)), key='update:json')
 
 
+def _broadcast_spectators(room_id, room):
+    """Send the spectator frame, encoded once per wire format and shared by every spectator"""
+    server = socketio.server
+    wires = set(room.spectators.values())
+    if WIRE_BINARY in wires:
+        # Same bytes as the players' binary frame when both go out on this tick
+        room.frames.emit(server, 'pong_update', _spectator_room(room_id, WIRE_BINARY),
+                         lambda: _binary_frame(room), key='update:binary')
+    if WIRE_JSON in wires:
+        room.frames.emit(server, 'pong_update', _spectator_room(room_id, WIRE_JSON),
+                         lambda: room.spectator_snapshots.encode(room.game_state, scheduler.tick_count,
+                                                                 int(time.time() * 1000)), key='spectate:json')
+
+
+def _step_room(room_id, room):
+    """Advance one room by a single fixed timestep (see pong_sim.step) and broadcast its outcome"""
+    pending = room.pending_input
+    if pending['left'] is not None or pending['right'] is not None:
+        recordings.inputs(room_id, room.tick + 1, pending)
+    scoring_side, winner_side = sim_step(room, SERVE_DELAY_TICKS)
+    room.frames.invalidate()
+    if scoring_side:
+        _on_point_scored(room_id, room, scoring_side)
+    if winner_side:
+        _end_game(room_id, room, winner_side)
+
+
+def _on_point_scored(room_id, room, scoring_side):
+    """Broadcast a point; the ball is served again SERVE_DELAY_TICKS later"""
+    log_sim.limited(logging.DEBUG, "point_scored", room=room_id, side=scoring_side)
+    recordings.point(room_id, room.tick, scoring_side)
+    frames = room.frames
+    frames.emit(socketio.server, 'pong_score', room_id, lambda: {
+        'game_state': frames.state_wire(room.game_state),
+        'scoring_side': scoring_side
+    })
+
+
+def _end_game(room_id, room, winner_side):
+    """Stop the room's simulation and announce the winner"""
+    log_sim.info("game_over", room=room_id, winner=winner_side)
+    room.game_running = False
+    room.winner = winner_side
+    room.phase = PHASE_PLAYING
+    recordings.finish(room_id, room.tick, winner_side)
+    scheduler.remove(room_id)
+    active_rooms.put(room_id, room)
+    frames = room.frames
+    frames.emit(socketio.server, 'pong_game_over', room_id, lambda: {
+        'winner': winner_side,
+        'game_state': frames.state_wire(room.game_state),
+        'score': frames.state_wire(room.game_state)['score'],
+        'win_points': room.win_points
+    })
+
 
 @socketio.on('dissolve_room')
 def on_dissolve_room(data):
@@ -1076,26 +1562,49 @@ def on_dissolve_room(data):
     if not room_id or not username:
         return
     
+    if not _owns_room(room_id):
+        # The owning shard checks the creator and dissolves it
+        shard_bus.publish('rooms', {'op': 'dissolve', 'room_id': room_id, 'username': username})
+        return
+    
     state = active_rooms.get(room_id)
     if not state:
         return
     
     # Only room creator can dissolve room
-    if username != state['room_creator']:
+    if username != state.room_creator:
         emit('error', {'message': 'Only room creator can dissolve room'})
         return
     
+    _dissolve_room(room_id, state)
+
+def _dissolve_room(room_id, state):
+    """Delete a room from memory and the database and send its players to the lobby"""
     # Emit realtime room update to dashboard
-    socketio.emit('room_dissolved', {'room_id': room_id})
+    _announce_room_dissolved(room_id)
     
     # delete from memory and database if exists
+    memberships.remove_room(room_id, state.members)
+    _drop_spectators(room_id, state)
+    reaper.mark_occupied(room_id)  # gone already; nothing left to expire
     active_rooms.pop(room_id, None)
+    scheduler.remove(room_id)
     room = Room.query.filter_by(id=room_id).first()
     if room:
         db.session.delete(room)
         db.session.commit()
     
-    emit('room_dissolved', {'room_id': room_id}, room=room_id)
+    socketio.emit('room_dissolved', {'room_id': room_id}, room=room_id)
+
+def _on_room_command(message):
+    """Room requests forwarded by other shards (dissolve from a dashboard socket there)"""
+    room_id = message.get('room_id')
+    if message.get('op') != 'dissolve' or not _owns_room(room_id):
+        return
+    state = active_rooms.get(room_id)
+    if state and message.get('username') == state.room_creator:
+        with app.app_context():
+            _dissolve_room(room_id, state)
 
 @socketio.on("leave_room")
 def on_leave(data):
@@ -1103,33 +1612,46 @@ def on_leave(data):
     username = session.get('username')
     if not room_id or not username:
         return
+    if spectating.get(request.sid) == room_id:
+        _stop_spectating(request.sid)
+        return
     
     leave_room(room_id)
+    leave_room(_wire_room(room_id, WIRE_JSON))
+    leave_room(_wire_room(room_id, WIRE_BINARY))
+    memberships.remove_sid(request.sid, room_id)
     state = active_rooms.get(room_id)
-    if state and username in state['members']:
-        state['members'].remove(username)
+    if state:
+        state.drop_sid(request.sid)
+    if state and username in state.members and not memberships.in_room(username, room_id):
+        state.members.remove(username)
+        active_rooms.put(room_id, state)
         
         # Emit realtime room update to dashboard
-        socketio.emit('room_updated', {
-            'room_id': room_id,
-            'players': len(state['members'])
-        })
+        _announce_room_updated(room_id, len(state.members))
         
         emit("user_left", {
             "username": username, 
-            "players": list(state['members'])
+            "players": list(state.members)
         }, room=room_id)
         
         # cleanup if empty
-        if not state['members']:
+        if not state.members:
+            _drop_spectators(room_id, state)
             active_rooms.pop(room_id, None)
+            scheduler.remove(room_id)
             room = Room.query.filter_by(id=room_id).first()
             if room:
                 db.session.delete(room)
                 db.session.commit()
             
             # Emit realtime room update to dashboard
-            socketio.emit('room_dissolved', {'room_id': room_id})
+            _announce_room_dissolved(room_id)
+
+# Lobby changes and room commands from the other shards
+shard_bus.subscribe('lobby', _apply_lobby_event)
+shard_bus.subscribe('rooms', _on_room_command)
+shard_bus.start(socketio.start_background_task)
 
 if __name__ == "__main__":
     # For local development only
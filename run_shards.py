@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Launch Pong as several sharded server processes on one machine
+
+Each process serves on its own port and owns the rooms that hash to it
+(see sharding.py); room pages and sockets are redirected to the owning
+process and lobby updates travel between processes over Unix sockets.
+All shards share the database, so point DATABASE_URL at a server database
+(PostgreSQL) for anything beyond local testing.
+
+    python run_shards.py --shards 4          # ports 5001-5004
+    open http://127.0.0.1:5001
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run sharded Pong server processes")
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 2, help='number of processes')
+    parser.add_argument('--host', default='127.0.0.1', help='host in the shard URLs browsers are sent to')
+    parser.add_argument('--base-port', type=int, default=5001, help='port of shard 0; shard i uses base + i')
+    parser.add_argument('--bus-dir', default='/tmp/pong-bus', help='directory for the lobby bus sockets')
+    args = parser.parse_args(argv)
+    if args.shards < 2:
+        parser.error("use start.py for a single process")
+
+    ports = [args.base_port + i for i in range(args.shards)]
+    urls = ','.join(f"http://{args.host}:{port}" for port in ports)
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    processes = []
+    for shard_id, port in enumerate(ports):
+        env = dict(os.environ, PORT=str(port), PONG_SHARDS=urls,
+                   PONG_SHARD_ID=str(shard_id), PONG_BUS_DIR=args.bus_dir)
+        processes.append(subprocess.Popen([sys.executable, os.path.join(here, 'start.py')], env=env, cwd=here))
+        print(f"Shard {shard_id} (pid {processes[-1].pid}) on http://{args.host}:{port}")
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)  # stop the shards with us, not just on Ctrl+C
+    try:
+        while all(p.poll() is None for p in processes):
+            time.sleep(0.5)
+        print("A shard exited; stopping the others")
+    except KeyboardInterrupt:
+        print("\nStopping shards")
+    finally:
+        for p in processes:
+            if p.poll() is None:
+                p.send_signal(signal.SIGINT)
+        for p in processes:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Multi-process sharding for Pong rooms
+
+Each worker process owns a subset of room ids, chosen by consistent hashing
+over the configured shard URLs. A room's game page and its Socket.IO
+connection are served by the owning shard (other shards redirect there), so
+all traffic for a room is sticky to one process and its active_rooms.
+
+Lobby changes (room created, updated, dissolved, game started) are shared
+between shards over a MessageBus. LocalBus connects shards living in one
+process (tests); UnixSocketBus sends datagrams between processes on one
+machine.
+
+Configured from the environment (see run_shards.py):
+
+  PONG_SHARDS     comma-separated base URLs of every shard, e.g.
+                  http://127.0.0.1:5001,http://127.0.0.1:5002
+  PONG_SHARD_ID   index of this process in PONG_SHARDS
+  PONG_BUS_DIR    directory for the shards' bus sockets (default /tmp/pong-bus)
+"""
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+
+from pong_logging import get_logger
+
+log = get_logger('lobby')
+
+VNODES = 160  # Points per shard on the ring; more points spread rooms more evenly
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Consistent hash ring mapping room ids to shard indexes"""
+
+    def __init__(self, shard_count, vnodes=VNODES):
+        points = sorted((_hash(f"shard-{shard}#{i}"), shard)
+                        for shard in range(shard_count) for i in range(vnodes))
+        self.keys = [key for key, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def owner(self, room_id):
+        i = bisect.bisect(self.keys, _hash(room_id)) % len(self.keys)
+        return self.shards[i]
+
+
+class ShardConfig:
+    """This process's place in the shard set"""
+
+    def __init__(self, urls, shard_id):
+        if not 0 <= shard_id < len(urls):
+            raise ValueError(f"shard id {shard_id} out of range for {len(urls)} shards")
+        self.urls = [url.rstrip('/') for url in urls]
+        self.shard_id = shard_id
+        self.ring = HashRing(len(urls))
+
+    def owns(self, room_id):
+        return self.ring.owner(room_id) == self.shard_id
+
+    def room_url(self, room_id, path):
+        """Absolute URL of path on the shard that owns room_id"""
+        return self.urls[self.ring.owner(room_id)] + path
+
+
+def config_from_env(environ=os.environ):
+    """ShardConfig for PONG_SHARDS/PONG_SHARD_ID, or None when running unsharded"""
+    urls = [url.strip() for url in environ.get('PONG_SHARDS', '').split(',') if url.strip()]
+    if len(urls) < 2:
+        return None
+    return ShardConfig(urls, int(environ.get('PONG_SHARD_ID', '0')))
+
+
+class MessageBus:
+    """Publish/subscribe between shards; messages are JSON-serializable dicts
+
+    publish() delivers to the other shards only; a shard applies its own
+    changes directly.
+    """
+
+    def publish(self, topic, message):
+        raise NotImplementedError
+
+    def subscribe(self, topic, callback):
+        raise NotImplementedError
+
+    def start(self, spawn):
+        """Begin delivering incoming messages, using spawn(fn) to run a background loop"""
+
+
+class LocalBus(MessageBus):
+    """In-process bus; every LocalBus built on the same hub list sees the others' messages"""
+
+    def __init__(self, hub=None):
+        self.hub = hub if hub is not None else []
+        self.hub.append(self)
+        self.callbacks = {}  # topic -> [callback]
+
+    def publish(self, topic, message):
+        for bus in self.hub:
+            if bus is not self:
+                bus._deliver(topic, message)
+
+    def subscribe(self, topic, callback):
+        self.callbacks.setdefault(topic, []).append(callback)
+
+    def _deliver(self, topic, message):
+        for callback in self.callbacks.get(topic, ()):
+            callback(message)
+
+
+class UnixSocketBus(LocalBus):
+    """Datagram bus between shard processes on one machine
+
+    Every shard binds <bus_dir>/shard-<id>.sock and publishes by sending one
+    datagram per peer. Delivery is best effort: a peer that is down simply
+    misses the message.
+    """
+
+    def __init__(self, bus_dir, shard_id, shard_count):
+        super().__init__(hub=[])
+        os.makedirs(bus_dir, exist_ok=True)
+        self.paths = [os.path.join(bus_dir, f"shard-{i}.sock") for i in range(shard_count)]
+        self.shard_id = shard_id
+        path = self.paths[shard_id]
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(path)
+        self.out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.out.setblocking(False)
+
+    def publish(self, topic, message):
+        data = json.dumps({'topic': topic, 'message': message}, separators=(',', ':')).encode()
+        for i, path in enumerate(self.paths):
+            if i == self.shard_id:
+                continue
+            try:
+                self.out.sendto(data, path)
+            except OSError:
+                pass  # peer not running (or its queue is full)
+
+    def start(self, spawn):
+        spawn(self._receive_loop)
+
+    def _receive_loop(self):
+        while True:
+            data = self.sock.recv(65536)
+            try:
+                packet = json.loads(data)
+                self._deliver(packet['topic'], packet['message'])
+            except Exception as e:
+                log.limited(logging.WARNING, "bus_message_dropped", error=e)
+
+
+def bus_from_env(config, environ=os.environ):
+    """Bus for the configured shard set (a no-op LocalBus when unsharded)"""
+    if config is None:
+        return LocalBus()
+    bus_dir = environ.get('PONG_BUS_DIR', '/tmp/pong-bus')
+    return UnixSocketBus(bus_dir, config.shard_id, len(config.urls))
@@ -6,11 +6,15 @@ This script ensures proper eventlet initialization for WebSocket support
 import eventlet
 eventlet.monkey_patch()
 
+import os
+
 from run import app, socketio
 
+PORT = int(os.environ.get('PORT', 5000))
+
 if __name__ == "__main__":
     print("🚀 Starting Pong Multiplayer Server...")
-    print("🌐 WebSocket server will be available at: http://localhost:5000")
+    print(f"🌐 WebSocket server will be available at: http://localhost:{PORT}")
     print("📱 Open multiple browser tabs to test multiplayer!")
     print("⚠️  Press Ctrl+C to stop the server")
     print("-" * 50)
@@ -20,7 +24,7 @@ if __name__ == "__main__":
         socketio.run(
             app, 
             host='0.0.0.0', 
-            port=5000, 
+            port=PORT, 
             debug=True, 
             use_reloader=False,
             allow_unsafe_werkzeug=True
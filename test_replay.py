@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Replay test for the deterministic simulation core (pong_sim.py)
+
+Plays matches with scripted paddle input, recording the room seed and every
+input by tick, then replays the recording into a fresh room and checks that
+scores, positions and velocities match bit for bit on every tick. Another
+test does the same through the server's binary recording files (recording.py),
+one checks the NumPy batch engine (pong_batch.py) against step(), and the last
+checks the computer paddle's closed-form intercept against stepped bounces.
+
+    python test_replay.py        # or: python -m pytest test_replay.py
+"""
+import hashlib
+import random
+import struct
+import tempfile
+
+import pytest
+
+from pong_batch import BatchPhysics, numpy_available
+from pong_sim import AI_FACE_X, BALL_RADIUS, CANVAS_HEIGHT, predict_intercept, step
+from recording import RecordingStore, replay
+from pong_state import new_room_state
+
+if numpy_available():
+    import numpy as np
+
+MAX_TICKS = 60 * 120  # two simulated minutes per match
+_STATE = struct.Struct('<8d2I')
+
+
+def _fingerprint(room):
+    """Exact bytes of everything a client sees (float64, so bit-identical means equal bytes)"""
+    game_state = room.game_state
+    ball = game_state.ball
+    return _STATE.pack(ball.x, ball.y, ball.dx, ball.dy, game_state.left.y, game_state.right.y,
+                       room.tick, room.serve_tick or 0, game_state.score.left, game_state.score.right)
+
+
+def _new_room(mode, seed):
+    room = new_room_state(mode, win_points=3, room_creator='alice', members={'alice', 'bob'}, seed=seed)
+    if mode == 'bot':
+        room.players = {'left': 'Computer', 'right': 'alice'}
+    else:
+        room.players = {'left': 'bob', 'right': 'alice'}
+    room.game_running = True
+    return room
+
+
+def record_match(mode, seed, input_seed):
+    """Play a match with scripted humans; returns (inputs, per-tick digests, final room)
+
+    inputs is a list of (tick, side, y). The global random module is
+    churned on every tick, as other rooms on a live server would.
+    """
+    room = _new_room(mode, seed)
+    humans = [side for side in ('left', 'right') if room.players[side] != 'Computer']
+    script = random.Random(input_seed)
+    inputs = []
+    digests = []
+    while room.tick < MAX_TICKS:
+        tick = room.tick + 1  # the tick these inputs are applied on
+        for side in humans:
+            if script.random() < 0.25:  # a mouse move roughly every fourth tick
+                y = room.game_state.ball.y - 40 + script.uniform(-60, 60)
+                y = max(0, min(520, y))
+                room.pending_input[side] = y
+                inputs.append((tick, side, y))
+        random.random()
+        _, winner = step(room)
+        digests.append(hashlib.sha1(_fingerprint(room)).digest())
+        if winner:
+            break
+    return inputs, digests, room
+
+
+def replay_match(mode, seed, inputs):
+    """Feed a recording into a fresh room; returns (per-tick digests, final room)"""
+    room = _new_room(mode, seed)
+    by_tick = {}
+    for tick, side, y in inputs:
+        by_tick.setdefault(tick, []).append((side, y))
+    digests = []
+    while room.tick < MAX_TICKS:
+        for side, y in by_tick.get(room.tick + 1, ()):
+            room.pending_input[side] = y
+        _, winner = step(room)
+        digests.append(hashlib.sha1(_fingerprint(room)).digest())
+        if winner:
+            break
+    return digests, room
+
+
+def _check_replay(mode, seed, input_seed):
+    inputs, recorded, live = record_match(mode, seed, input_seed)
+    replayed, room = replay_match(mode, seed, inputs)
+    assert len(replayed) == len(recorded), f"replay ended at tick {room.tick}, match at {live.tick}"
+    for tick, (a, b) in enumerate(zip(recorded, replayed), start=1):
+        assert a == b, f"{mode} replay diverged at tick {tick}"
+    assert _fingerprint(room) == _fingerprint(live)
+    assert (room.game_state.score.left, room.game_state.score.right) == \
+        (live.game_state.score.left, live.game_state.score.right)
+    return live
+
+
+def test_pvp_replay_is_bit_identical():
+    live = _check_replay('pvp', seed=1234, input_seed=99)
+    assert max(live.game_state.score.left, live.game_state.score.right) == live.win_points
+
+
+def test_bot_replay_is_bit_identical():
+    live = _check_replay('bot', seed=2024, input_seed=7)
+    assert live.game_state.score.left + live.game_state.score.right > 0
+
+
+def test_seed_changes_the_match():
+    inputs, recorded, _ = record_match('bot', seed=1, input_seed=5)
+    replayed, _ = replay_match('bot', seed=2, inputs=inputs)
+    assert recorded != replayed
+
+
+def test_recording_file_replays_the_match():
+    """Round trip through the binary recording format used by the server"""
+    inputs, recorded, live = record_match('pvp', seed=77, input_seed=3)
+    with tempfile.TemporaryDirectory() as directory:
+        store = RecordingStore(directory)
+        room = _new_room('pvp', 77)
+        match_id = store.start('room-1', room, serve_ticks=60, tick_rate=60)
+        by_tick = {}
+        for tick, side, y in inputs:
+            by_tick.setdefault(tick, {'left': None, 'right': None})[side] = y
+        for tick, pending in sorted(by_tick.items()):
+            store.inputs('room-1', tick, pending)
+        score = live.game_state.score
+        winner = 'left' if score.left == live.win_points else 'right' if score.right == live.win_points else None
+        store.finish('room-1', live.tick, winner)
+        store.flush()
+        size = len(store.read(match_id))
+        header, records = store.load(match_id)
+    digests = [hashlib.sha1(_fingerprint(r)).digest() for r, _, _ in replay(header, records)]
+    assert digests == recorded
+    assert size < 64 * 1024, f"recording is {size} bytes"  # vs ~60 bytes per snapshot per tick
+
+
+class _PinnedDraws:
+    """Random draws that depend only on the kind of draw and how many came before it
+
+    pong_sim asks random.Random for its choices and BatchPhysics asks a NumPy
+    Generator for the same ones, sometimes in a different order (the serve
+    picks dx from a choice in pong_sim, from the scoring side in the batch).
+    Keeping one stream per kind of draw gives both engines the same values.
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.streams = {}
+
+    def _next(self, kind):
+        stream = self.streams.get(kind)
+        if stream is None:
+            stream = self.streams[kind] = random.Random(f'{self.seed}:{kind}')
+        return stream.random()
+
+
+class _PinnedRandom(_PinnedDraws):
+    """The random.Random calls pong_sim makes"""
+
+    def random(self):
+        return self._next('random')
+
+    def uniform(self, a, b):
+        return a + (b - a) * self._next(f'uniform{b}')
+
+    def choice(self, seq):
+        return seq[int(self._next(f'choice{len(seq)}') * len(seq))]
+
+    def randint(self, a, b):
+        return a + int(self._next('integers') * (b - a + 1))
+
+
+class _PinnedGenerator(_PinnedDraws):
+    """The numpy.random.Generator calls BatchPhysics makes, drawing from the same streams"""
+
+    def random(self, size):
+        return np.array([self._next('random') for _ in range(size)])
+
+    def uniform(self, a, b, size):
+        return np.array([a + (b - a) * self._next(f'uniform{b}') for _ in range(size)])
+
+    def choice(self, seq, size):
+        return np.array([seq[int(self._next(f'choice{len(seq)}') * len(seq))] for _ in range(size)])
+
+    def integers(self, a, b, size):
+        return np.array([a + int(self._next('integers') * (b - a)) for _ in range(size)])
+
+
+def test_batch_physics_matches_pong_sim():
+    """BatchPhysics and step() side by side on a bot-vs-bot room with the random draws pinned"""
+    pytest.importorskip('numpy')
+    room = _new_room('bot', seed=1)
+    room.players = {'left': 'Computer', 'right': 'Computer'}
+    room.win_points = 10 ** 6
+    room.rng = _PinnedRandom(seed=11)
+    batch = BatchPhysics(serve_ticks=60, rng=_PinnedGenerator(seed=11))
+    batch.add('room-1', _new_room('bot', seed=1).game_state, room.win_points, bot_left=True, bot_right=True)
+
+    walls = hits = serves = 0
+    for tick in range(1, 20001):
+        ball = room.game_state.ball
+        before = (ball.x, ball.dx, ball.dy)
+        scoring_side, _ = step(room, 60)
+        events = batch.step()
+
+        game_state = room.game_state
+        expected = (ball.x, ball.y, ball.dx, ball.dy, game_state.left.y, game_state.right.y)
+        actual = (batch.ball_x[0], batch.ball_y[0], batch.ball_dx[0], batch.ball_dy[0],
+                  batch.left_y[0], batch.right_y[0])
+        assert np.allclose(expected, actual), f"positions diverged at tick {tick}: {expected} vs {actual}"
+        assert (game_state.score.left, game_state.score.right) == \
+            (batch.score_left[0], batch.score_right[0]), f"scores diverged at tick {tick}"
+        assert [e[1] for e in events] == ([scoring_side] if scoring_side else [])
+
+        if ball.x == 400 and before[0] != 400:
+            serves += 1
+        elif ball.dx != before[1]:
+            hits += 1
+        elif ball.dy != before[2]:
+            walls += 1
+    score = room.game_state.score
+    assert score.left > 0 and score.right > 0
+    assert serves == score.left + score.right
+    assert walls > 10 and hits > 10, (walls, hits)
+
+
+def _stepped_intercept(x, y, dx, dy, face_x):
+    """Brute force for predict_intercept: move the ball tick by tick, reflecting off the walls
+
+    Returns (y at face_x, ticks, wall bounces). The last tick is a partial one.
+    """
+    low, high = BALL_RADIUS, CANVAS_HEIGHT - BALL_RADIUS
+    ticks = 0.0
+    bounces = 0
+    while True:
+        fraction = min(1.0, (face_x - x) / dx)
+        x += dx * fraction
+        y += dy * fraction
+        ticks += fraction
+        while not low <= y <= high:
+            y = 2 * low - y if y < low else 2 * high - y
+            dy = -dy
+            bounces += 1
+        if fraction < 1.0:
+            return y, ticks, bounces
+
+
+def test_predict_intercept_matches_stepped_bounces():
+    script = random.Random(42)
+    cases = [(400, 300, -4, 0), (400, 300, 4, 2), (400, 300, -4, -2), (700, 20, -12, -1.5),
+             (100, 580, 0.5, 11.5), (750, 300, -0.7, -12)]
+    cases += [(script.uniform(100, 700), script.uniform(BALL_RADIUS, CANVAS_HEIGHT - BALL_RADIUS),
+               script.choice((-1, 1)) * script.uniform(0.5, 12), script.uniform(-12, 12)) for _ in range(500)]
+    most_bounces = 0
+    for x, y, dx, dy in cases:
+        face_x = AI_FACE_X['left' if dx < 0 else 'right']
+        expected_y, expected_ticks, bounces = _stepped_intercept(x, y, dx, dy, face_x)
+        predicted_y, predicted_ticks = predict_intercept(x, y, dx, dy, face_x)
+        assert abs(predicted_y - expected_y) < 1e-6, (x, y, dx, dy, predicted_y, expected_y)
+        assert abs(predicted_ticks - expected_ticks) < 1e-6
+        most_bounces = max(most_bounces, bounces)
+    assert most_bounces >= 10
+
+
+if __name__ == "__main__":
+    for test in (test_pvp_replay_is_bit_identical, test_bot_replay_is_bit_identical, test_seed_changes_the_match,
+                 test_recording_file_replays_the_match, test_batch_physics_matches_pong_sim,
+                 test_predict_intercept_matches_stepped_bounces):
+        test()
+        print(f"✅ {test.__name__}")